@@ -6,29 +6,45 @@ Flask server to serve the website and provide API endpoints for RAG queries
 
 import os
 import sys
+import re
 import json
+import atexit
 import time
+import queue
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory, redirect
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, redirect, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 # Add src directory to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+from src.sebi_json_provider import OrjsonProvider, ORJSON_AVAILABLE
+
 try:
-    from src.sebi_rag_system import SEBIRAGSystem
-except ImportError as e:
-    print(f"Error importing RAG system: {e}")
-    print("Please ensure the src directory is properly set up")
-    SEBIRAGSystem = None
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: request threads only enqueue records, a background
+# listener formats and writes them
+_log_queue = queue.Queue(-1)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+    force=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -36,15 +52,83 @@ app = Flask(__name__,
             static_folder='.',
             template_folder='.')
 
+# Use orjson for request parsing and jsonify when it is installed
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
 # Enable CORS for API endpoints
 CORS(app)
 
-# Global RAG system instance
+# Compress JSON, HTML, CSS and JS responses above 1 KB (brotli, else gzip).
+# Behind nginx, leave this to nginx's brotli/gzip modules instead.
+if Compress is not None:
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(app)
+
+# Browser cache lifetime for CSS/JS/images (seconds). Asset names are not
+# versioned, so keep this short enough for deploys to reach clients.
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '86400'))
+
+# Global RAG system instance and its query cache
 rag_system = None
+query_cache = None
+
+# Set when the RAG dependencies (langchain, torch, ...) fail to import
+_RAG_IMPORT_ERROR = None
+
+# Keep-alive HTTP client shared by all Groq calls in this process
+groq_http_client = None
+
+QUERY_TIMEOUT = 120  # Seconds a request waits for its RAG answer
+
+# Bounded pool running RAG calls, so a burst of uncached questions cannot start
+# an unbounded number of concurrent retrieval + LLM pipelines
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('RAG_MAX_WORKERS', '32')),
+    thread_name_prefix='rag-query'
+)
+
+def cached_query(question):
+    """Answer a question from the query cache, falling back to the RAG system"""
+    if query_cache is not None:
+        cached = query_cache.get(question)
+        if cached is not None:
+            return cached
+
+    result = EXECUTOR.submit(rag_system.query, question).result(timeout=QUERY_TIMEOUT)
+
+    if query_cache is not None and 'error' not in result:
+        query_cache.put(question, result)
+    return result
+
+def create_groq_http_client():
+    """Create a pooled keep-alive HTTP client for Groq (HTTP/2 when h2 is installed)"""
+    import httpx
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+    )
 
 def initialize_rag_system():
     """Initialize the RAG system"""
-    global rag_system
+    global rag_system, query_cache, groq_http_client, _RAG_IMPORT_ERROR
+
+    # Import lazily so workers that never initialize RAG skip langchain/torch
+    try:
+        from src.sebi_rag_system import SEBIRAGSystem
+        from src.sebi_query_cache import SEBIQueryCache
+    except ImportError as e:
+        _RAG_IMPORT_ERROR = str(e)
+        logger.error("Error importing RAG system: %s", e)
+        return False
 
     try:
         # Get API key
@@ -56,7 +140,10 @@ def initialize_rag_system():
         logger.info("Initializing SEBI RAG System...")
 
         # Initialize RAG system
-        rag_system = SEBIRAGSystem(groq_api_key)
+        if groq_http_client is None:
+            groq_http_client = create_groq_http_client()
+            atexit.register(groq_http_client.close)
+        rag_system = SEBIRAGSystem(groq_api_key, http_client=groq_http_client)
 
         # Load documents
         logger.info("Loading documents...")
@@ -69,14 +156,19 @@ def initialize_rag_system():
 
         # Setup LLM and QA chain
         logger.info("Setting up LLM and QA chain...")
-        rag_system.setup_llm()
+        rag_system.setup_llm(streaming=False)
         rag_system.create_qa_chain()
 
+        # Setup query cache (invalidated whenever the documents change)
+        query_cache = SEBIQueryCache(rag_system.embed_question_array)
+        query_cache.load(rag_system.corpus_hash)
+        atexit.register(query_cache.save)
+
         logger.info("SEBI RAG System initialized successfully!")
         return True
 
     except Exception as e:
-        logger.error(f"Failed to initialize RAG system: {e}")
+        logger.error("Failed to initialize RAG system: %s", e)
         return False
 
 @app.route('/')
@@ -84,20 +176,24 @@ def index():
     """Serve the main website"""
     return send_from_directory('.', 'index.html')
 
+def send_static_asset(directory, filename):
+    """Serve a static asset with ETag/Last-Modified validation and public caching"""
+    return send_from_directory(directory, filename, conditional=True, max_age=STATIC_MAX_AGE)
+
 @app.route('/css/<path:filename>')
 def serve_css(filename):
     """Serve CSS files"""
-    return send_from_directory('css', filename)
+    return send_static_asset('css', filename)
 
 @app.route('/js/<path:filename>')
 def serve_js(filename):
     """Serve JavaScript files"""
-    return send_from_directory('js', filename)
+    return send_static_asset('js', filename)
 
 @app.route('/images/<path:filename>')
 def serve_images(filename):
     """Serve image files"""
-    return send_from_directory('images', filename)
+    return send_static_asset('images', filename)
 
 @app.route('/scores/<path:filename>')
 def serve_scores(filename):
@@ -106,12 +202,22 @@ def serve_scores(filename):
         return redirect('http://127.0.0.1:5001/', code=302)
     return redirect(f'http://127.0.0.1:5001/{filename}', code=302)
 
+# ISO timestamp memoized per wall-clock second: [timestamp, second]
+_TS_CACHE = ["", 0]
+
+def current_timestamp():
+    """Return the current local time as an ISO string, recomputed at most once per second"""
+    now = int(time.time())
+    if now != _TS_CACHE[1]:
+        _TS_CACHE[:] = [datetime.fromtimestamp(now).isoformat(), now]
+    return _TS_CACHE[0]
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': current_timestamp(),
         'rag_system_available': rag_system is not None
     })
 
@@ -119,47 +225,63 @@ def health_check():
 def get_stats():
     """Get system statistics"""
     if not rag_system:
-        return jsonify({
+        response = {
             'error': 'RAG system not available',
             'message': 'The RAG system is currently unavailable. Please try again later.'
-        }), 503
+        }
+        if _RAG_IMPORT_ERROR:
+            response['import_error'] = _RAG_IMPORT_ERROR
+        return jsonify(response), 503
 
     try:
         stats = rag_system.get_stats()
+        if query_cache is not None:
+            stats['query_cache'] = query_cache.stats()
         return jsonify({
             'success': True,
             'stats': stats,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': current_timestamp()
         })
     except Exception as e:
-        logger.error(f"Error getting stats: {e}")
+        logger.error("Error getting stats: %s", e)
         return jsonify({
             'error': 'Failed to get statistics',
             'message': str(e)
         }), 500
 
+def _invalid_request():
+    """400 response for a body that is not a JSON object with a string question"""
+    return jsonify({
+        'success': False,
+        'error': 'Invalid request',
+        'message': 'Question is required'
+    }), 400
+
+def _is_valid_payload(data):
+    """Check the parsed body is an object whose question, if present, is a string"""
+    return isinstance(data, dict) and isinstance(data.get('question', ''), str)
+
 @app.route('/api/query', methods=['POST'])
 def query_rag():
     """Query the RAG system"""
+    # Parse the body once and reuse it in every branch
+    data = request.get_json(silent=True) or {}
+    if not _is_valid_payload(data):
+        return _invalid_request()
+    question = (data.get('question') or '').strip()
+
     if not rag_system:
         return jsonify({
             'success': False,
             'error': 'RAG system not available',
             'message': 'The RAG system is currently unavailable. Please try again later.',
-            'fallback_response': get_fallback_response(request.json.get('question', '') if request.json else '')
+            'fallback_response': get_fallback_response(question)
         }), 503
 
     try:
-        data = request.get_json()
-
-        if not data or 'question' not in data:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid request',
-                'message': 'Question is required'
-            }), 400
+        if 'question' not in data:
+            return _invalid_request()
 
-        question = data['question'].strip()
         if not question:
             return jsonify({
                 'success': False,
@@ -167,13 +289,13 @@ def query_rag():
                 'message': 'Please provide a valid question'
             }), 400
 
-        logger.info(f"Processing query: {question}")
+        logger.info("Processing query: %s", question)
 
         # Start timing
         start_time = time.time()
 
-        # Query the RAG system
-        result = rag_system.query(question)
+        # Query the RAG system (cached; misses run on the bounded executor)
+        result = cached_query(question)
 
         # Calculate processing time
         processing_time = time.time() - start_time
@@ -189,45 +311,135 @@ def query_rag():
             'timestamp': result['timestamp']
         }
 
-        logger.info(f"Query processed successfully in {processing_time:.2f}s")
+        logger.info("Query processed successfully in %.2fs", processing_time)
         return jsonify(response_data)
 
     except Exception as e:
-        logger.error(f"Error processing query: {e}")
+        logger.error("Error processing query: %s", e)
         return jsonify({
             'success': False,
             'error': 'Query processing failed',
             'message': str(e),
-            'fallback_response': get_fallback_response(request.json.get('question', '') if request.json else '')
+            'fallback_response': get_fallback_response(question)
         }), 500
 
+def _sse_event(event):
+    """Encode one event dictionary as a Server-Sent Events frame"""
+    return f"data: {app.json.dumps(event)}\n\n"
+
+@app.route('/api/query/stream', methods=['GET', 'POST'])
+def query_rag_stream():
+    """Query the RAG system, streaming the answer as Server-Sent Events"""
+    # EventSource clients can only send GET, so also accept ?question=
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+    if not _is_valid_payload(data):
+        return _invalid_request()
+    question = (data.get('question') or '').strip()
+
+    if not rag_system:
+        return jsonify({
+            'success': False,
+            'error': 'RAG system not available',
+            'message': 'The RAG system is currently unavailable. Please try again later.',
+            'fallback_response': get_fallback_response(question)
+        }), 503
+
+    if not question:
+        return jsonify({
+            'success': False,
+            'error': 'Empty question',
+            'message': 'Please provide a valid question'
+        }), 400
+
+    logger.info("Streaming query: %s", question)
+
+    def generate():
+        cached = query_cache.get(question) if query_cache is not None else None
+        if cached is not None:
+            yield _sse_event({'type': 'sources', 'sources': cached['sources'], 'source_count': cached['source_count']})
+            yield _sse_event({'type': 'token', 'content': cached['answer']})
+            yield _sse_event({'type': 'done', 'timestamp': cached['timestamp']})
+            return
+
+        sources = []
+        answer_parts = []
+        for event in rag_system.query_stream(question):
+            if event['type'] == 'sources':
+                sources = event['sources']
+            elif event['type'] == 'token':
+                answer_parts.append(event['content'])
+            elif event['type'] == 'done' and query_cache is not None:
+                query_cache.put(question, {
+                    'question': question,
+                    'answer': ''.join(answer_parts),
+                    'sources': sources,
+                    'source_count': len(sources),
+                    'timestamp': event['timestamp']
+                })
+            yield _sse_event(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/log', methods=['POST'])
 def log_query():
     """Log query for analytics"""
     try:
         data = request.get_json()
         if data:
-            logger.info(f"Query logged: {data.get('question', 'N/A')} - Success: {data.get('success', False)}")
+            logger.info("Query logged: %s - Success: %s", data.get('question', 'N/A'), data.get('success', False))
         return jsonify({'success': True})
     except Exception as e:
-        logger.error(f"Error logging query: {e}")
+        logger.error("Error logging query: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Fallback answers in priority order, each triggered by any of its keywords
+FALLBACK_RESPONSES = [
+    (('registration', 'apply'),
+     "For SEBI registration information, please visit the official SEBI website at www.sebi.gov.in or contact SEBI's intermediary registration department. The registration process typically involves eligibility verification, document submission, and approval from SEBI."),
+    (('compliance', 'reporting'),
+     "SEBI compliance requirements are detailed in various master circulars available on the official SEBI website. Intermediaries must maintain proper records, submit periodic reports, and adhere to regulatory guidelines. Please refer to the latest SEBI circulars for specific requirements."),
+    (('eligibility',),
+     "Eligibility criteria for SEBI registration vary by intermediary type. Please check the specific requirements for your category on the SEBI website or consult with a regulatory expert. Common requirements include minimum net worth, qualified personnel, and proper infrastructure."),
+]
+
+def _build_fallback_matcher():
+    """Compile all fallback keywords into one automaton scanning the question in a single pass"""
+    keywords = {
+        keyword: priority
+        for priority, (triggers, _) in enumerate(FALLBACK_RESPONSES)
+        for keyword in triggers
+    }
+
+    try:
+        import ahocorasick
+    except ImportError:
+        # Without pyahocorasick, a regex alternation gives the same single pass
+        pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+        return lambda text: {keywords[match.group(0)] for match in pattern.finditer(text)}
+
+    automaton = ahocorasick.Automaton()
+    for keyword, priority in keywords.items():
+        automaton.add_word(keyword, priority)
+    automaton.make_automaton()
+    return lambda text: {priority for _, priority in automaton.iter(text)}
+
+_match_fallback_keywords = _build_fallback_matcher()
+
 def get_fallback_response(question):
     """Provide fallback responses when RAG system is unavailable"""
     if not question:
         return "I'm sorry, but the system is currently unavailable. Please try again later or contact SEBI directly."
 
-    question_lower = question.lower()
-
-    if 'registration' in question_lower or 'apply' in question_lower:
-        return "For SEBI registration information, please visit the official SEBI website at www.sebi.gov.in or contact SEBI's intermediary registration department. The registration process typically involves eligibility verification, document submission, and approval from SEBI."
-
-    if 'compliance' in question_lower or 'reporting' in question_lower:
-        return "SEBI compliance requirements are detailed in various master circulars available on the official SEBI website. Intermediaries must maintain proper records, submit periodic reports, and adhere to regulatory guidelines. Please refer to the latest SEBI circulars for specific requirements."
-
-    if 'eligibility' in question_lower:
-        return "Eligibility criteria for SEBI registration vary by intermediary type. Please check the specific requirements for your category on the SEBI website or consult with a regulatory expert. Common requirements include minimum net worth, qualified personnel, and proper infrastructure."
+    matches = _match_fallback_keywords(question.lower())
+    if matches:
+        return FALLBACK_RESPONSES[min(matches)][1]
 
     return "I'm currently unable to access detailed regulatory information. Please visit the official SEBI website (www.sebi.gov.in) for the most current regulations and guidelines, or consult with qualified regulatory professionals for specific advice."
 
@@ -242,14 +454,19 @@ def not_found(error):
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error)
     return jsonify({
         'error': 'Internal Server Error',
         'message': 'An unexpected error occurred'
     }), 500
 
+# Under a WSGI server (e.g. Gunicorn via run.py) main() never runs, so each
+# worker process initializes its own RAG system once when it imports this module
+if __name__ != '__main__' and os.getenv('SEBI_RAG_AUTOINIT') == '1':
+    initialize_rag_system()
+
 def main():
-    """Main function to run the Flask application"""
+    """Main function to run the Flask application (development server)"""
     print("🏛️  SEBI RAG Web Application")
     print("=" * 50)
 
@@ -268,6 +485,7 @@ def main():
     print("   - GET  /api/health")
     print("   - GET  /api/stats")
     print("   - POST /api/query")
+    print("   - GET/POST /api/query/stream")
     print("   - POST /api/log")
 
     # Run the Flask application
@@ -6,6 +6,7 @@ Simple script to run the Flask web application
 
 import os
 import sys
+import shutil
 import subprocess
 
 def check_requirements():
@@ -26,6 +27,42 @@ def check_requirements():
             print("❌ Failed to install Flask dependencies")
             return False
 
+def gunicorn_command():
+    """Build the Gunicorn command line, or None if Gunicorn is not installed"""
+    gunicorn = shutil.which('gunicorn')
+    if not gunicorn:
+        return None
+
+    # Each worker holds its own embedding and reranker models (~2 GB), so keep
+    # the default small; threads serve concurrent requests within a worker
+    workers = os.getenv('WEB_CONCURRENCY', '2')
+    threads = os.getenv('GUNICORN_THREADS', '4')
+    # Workers load their models before serving; leave room for a cold start
+    timeout = os.getenv('GUNICORN_TIMEOUT', '300')
+    return [
+        gunicorn,
+        '-k', 'gthread',
+        '-w', workers,
+        '--threads', threads,
+        '-t', timeout,
+        '-b', '0.0.0.0:5000',
+        'app:app',
+    ]
+
+def build_vector_store(env):
+    """
+    Build or verify the vector store in a child process before workers start
+
+    Workers only open the finished store; building it here keeps them from
+    racing to embed the corpus into the same directory.
+    """
+    print("📚 Preparing vector store (first run embeds the corpus)...")
+    try:
+        subprocess.run([sys.executable, '-m', 'src.sebi_rag_system', '--build-store'], check=True, env=env)
+        print("✅ Vector store ready")
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️  Could not prepare vector store ({e}); workers will build it under a lock")
+
 def main():
     """Main launcher function"""
     print("🏛️  SEBI RAG Web Application Launcher")
@@ -53,11 +90,33 @@ def main():
     print("🚀 Starting SEBI RAG Web Application...")
     print("   Open your browser to: http://localhost:5000")
     print("   Press Ctrl+C to stop the server")
+
+    # Prefer Gunicorn so concurrent queries are served by separate worker
+    # processes; fall back to the Flask development server (e.g. on Windows)
+    command = gunicorn_command()
+    env = os.environ.copy()
+    if command:
+        # Build with the libraries' all-core defaults, before the per-worker limits below
+        build_vector_store(os.environ)
+        # Each worker imports app.py and loads its own RAG system
+        env['SEBI_RAG_AUTOINIT'] = '1'
+        # Skip per-request INFO logging in production unless asked for
+        env.setdefault('LOG_LEVEL', 'WARNING')
+        # Concurrency comes from worker processes, so keep each worker's
+        # OpenMP/MKL/tokenizer pools single-threaded instead of N_cpu threads
+        # per worker oversubscribing the host. The single-process development
+        # server keeps the libraries' all-core defaults.
+        env.setdefault('OMP_NUM_THREADS', '1')
+        env.setdefault('MKL_NUM_THREADS', '1')
+        env.setdefault('TOKENIZERS_PARALLELISM', 'false')
+        print(f"   Serving with Gunicorn ({command[command.index('-w') + 1]} workers)")
+    else:
+        command = [sys.executable, 'app.py']
+        print("   Gunicorn not found - using the Flask development server")
     print()
 
     try:
-        # Run app.py
-        subprocess.run([sys.executable, 'app.py'], check=True)
+        subprocess.run(command, check=True, env=env)
     except KeyboardInterrupt:
         print("\n👋 Server stopped by user")
     except subprocess.CalledProcessError as e:
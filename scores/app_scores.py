@@ -6,18 +6,26 @@ Flask backend for handling complaint registration, lodging, tracking, and resolu
 
 import os
 import sys
-import json
+import hmac
+import atexit
+import time
 import hashlib
 import secrets
+import queue
 import sqlite3
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
 from pathlib import Path
 import uuid
-from typing import Optional, Dict, List, Any
-from werkzeug.utils import secure_filename
+from typing import Optional, Dict, List, Any, Tuple
+from werkzeug.utils import secure_filename, safe_join
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -30,9 +38,11 @@ except ImportError as e:
     print(f"Warning: RAG system not available: {e}")
     SEBIRAGSystem = None
 
+from src.sebi_json_provider import OrjsonProvider, ORJSON_AVAILABLE
+
 # Try to import MongoDB
 try:
-    from pymongo import MongoClient
+    from pymongo import MongoClient, InsertOne, WriteConcern
     MONGODB_AVAILABLE = True
 except ImportError:
     MONGODB_AVAILABLE = False
@@ -49,13 +59,36 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__, 
             static_folder='.', 
             template_folder='.')
-CORS(app)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+# The UI is served from this origin; only the JSON API needs cross-origin access
+CORS(app, resources={r'/api/*': {'origins': os.getenv('CORS_ORIGINS', '*').split(',')}})
 
 # Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(32))
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+if not app.config['SECRET_KEY']:
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+    logger.warning("SECRET_KEY not set; using a random key, so session tokens won't survive a restart or work across workers")
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024  # 200MB max total upload
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx'}
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '86400'))
+SESSION_TOKEN_TTL = int(os.getenv('SESSION_TOKEN_TTL', '3600'))  # seconds
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '5'))
+SQLITE_READ_POOL_SIZE = int(os.getenv('SQLITE_READ_POOL_SIZE', '8'))
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '300'))
+AUTH_CACHE_NEGATIVE_TTL = int(os.getenv('AUTH_CACHE_NEGATIVE_TTL', '30'))
+AUTH_CACHE_SIZE = 10000
+HISTORY_BATCH_SIZE = 100
+HISTORY_FLUSH_INTERVAL = 0.05  # seconds
+# Serving uploads from the reverse proxy: UPLOADS_ACCEL_PREFIX names an nginx
+# internal location for X-Accel-Redirect, USE_X_SENDFILE enables Apache/lighttpd X-Sendfile
+UPLOADS_ACCEL_PREFIX = os.getenv('UPLOADS_ACCEL_PREFIX', '')
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB limit per file
+ALLOWED_EXTENSIONS = frozenset({'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx'})
+
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='upload-save')
 
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -64,15 +97,114 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 db_connection = None
 rag_system = None
 
+class AuthCache:
+    """TTL + LRU cache of credential checks, so repeat logins skip the password KDF"""
+    
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL,
+                 negative_ttl: int = AUTH_CACHE_NEGATIVE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Per-process key: cache keys are useless outside this process and
+        # plaintext passwords are never held in memory
+        self._key = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def make_key(self, user_id: str, password: str) -> bytes:
+        """Derive the cache key for a credential pair"""
+        return hmac.new(self._key, f"{user_id}\0{password}".encode(), hashlib.sha256).digest()
+    
+    def get(self, key: bytes):
+        """Return (hit, user) for a key; user is None for a cached failure"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, user
+    
+    def put(self, key: bytes, user: Optional[Dict[str, Any]]):
+        """Cache a result; failed logins expire sooner to blunt brute-force probing"""
+        ttl = self.ttl if user is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class HistoryWriter:
+    """Background writer that batches complaint_history appends into bulk writes"""
+    
+    def __init__(self, write_batch, batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL):
+        """
+        Args:
+            write_batch: Function persisting a list of history entries in one operation
+            batch_size: Maximum entries per bulk write
+            flush_interval: Seconds to wait for more entries before flushing a partial batch
+        """
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+    
+    def add(self, entry: Dict[str, Any]):
+        """Queue a history entry for the next bulk write"""
+        self._queue.put(entry)
+    
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} complaint history entries: {e}")
+            if stop:
+                return
+    
+    def close(self):
+        """Flush queued entries and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
 class DatabaseManager:
     """Database manager with MongoDB primary and SQLite fallback"""
     
     def __init__(self):
         self.mongo_client = None
         self.mongo_db = None
-        self.sqlite_conn = None
+        self.sqlite_conn = None  # Single writer connection
+        self._read_pool = None  # Read-only connections for concurrent readers
+        self._write_lock = threading.Lock()
+        self.auth_cache = AuthCache()
         self.use_mongodb = False
         self.init_database()
+        self.history_writer = HistoryWriter(self._write_history_batch)
+        atexit.register(self.history_writer.close)
     
     def init_database(self):
         """Initialize database connection"""
@@ -80,11 +212,18 @@ class DatabaseManager:
         if MONGODB_AVAILABLE:
             try:
                 mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-                self.mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+                self.mongo_client = MongoClient(
+                    mongo_uri,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    retryWrites=True,
+                    serverSelectionTimeoutMS=5000
+                )
                 # Test connection
                 self.mongo_client.admin.command('ismaster')
                 self.mongo_db = self.mongo_client.scores_db
                 self.use_mongodb = True
+                self.create_mongo_indexes()
                 logger.info("Connected to MongoDB")
                 return
             except Exception as e:
@@ -93,11 +232,24 @@ class DatabaseManager:
         # Fall back to SQLite
         self.init_sqlite()
     
+    def create_mongo_indexes(self):
+        """Create indexes backing the MongoDB lookups (no-op if they already exist)"""
+        try:
+            self.mongo_db.users.create_index('user_id', unique=True)
+            self.mongo_db.complaints.create_index('complaint_id', unique=True)
+            self.mongo_db.complaints.create_index([('user_id', 1), ('created_at', -1)])
+            self.mongo_db.complaint_history.create_index('complaint_id')
+        except Exception as e:
+            logger.warning(f"Could not create MongoDB indexes: {e}")
+    
     def init_sqlite(self):
         """Initialize SQLite database"""
         db_path = os.path.join(os.path.dirname(__file__), 'scores.db')
-        self.sqlite_conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.sqlite_conn.row_factory = sqlite3.Row
+        self.sqlite_conn = self._connect_sqlite(db_path)
+        
+        # WAL lets readers proceed while a write is in progress (persistent
+        # per database, so it only needs setting once)
+        self.sqlite_conn.execute('PRAGMA journal_mode=WAL')
         
         # Create tables
         self.sqlite_conn.executescript('''
@@ -118,7 +270,7 @@ class DatabaseManager:
                 entity_type TEXT NOT NULL,
                 category TEXT NOT NULL,
                 description TEXT NOT NULL,
-                files TEXT,  -- JSON array of file paths
+                files TEXT,  -- Legacy JSON array of file paths, superseded by complaint_files
                 status TEXT DEFAULT 'submitted',
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
@@ -136,86 +288,227 @@ class DatabaseManager:
                 created_at TEXT NOT NULL,
                 FOREIGN KEY (complaint_id) REFERENCES complaints (complaint_id)
             );
+            
+            CREATE TABLE IF NOT EXISTS complaint_files (
+                complaint_id TEXT NOT NULL,
+                ord INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                PRIMARY KEY (complaint_id, ord),
+                FOREIGN KEY (complaint_id) REFERENCES complaints (complaint_id)
+            ) WITHOUT ROWID;
+            
+            -- users.pan is already covered by its UNIQUE constraint
+            CREATE INDEX IF NOT EXISTS idx_complaints_user_id ON complaints (user_id, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_history_complaint_id ON complaint_history (complaint_id);
         ''')
         self.sqlite_conn.commit()
+        
+        # Schema version 1: move the JSON files column into complaint_files
+        if self.sqlite_conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+            with self.sqlite_conn:
+                self.sqlite_conn.execute('''
+                    INSERT OR IGNORE INTO complaint_files (complaint_id, ord, filename)
+                    SELECT c.complaint_id, j.key, j.value
+                    FROM complaints c, json_each(c.files) j
+                    WHERE c.files IS NOT NULL AND json_valid(c.files)
+                ''')
+                self.sqlite_conn.execute('UPDATE complaints SET files = NULL')
+                self.sqlite_conn.execute('PRAGMA user_version = 1')
+        
+        # Pool of read-only connections so reads don't queue behind the writer
+        self._read_pool = queue.Queue()
+        for _ in range(SQLITE_READ_POOL_SIZE):
+            conn = self._connect_sqlite(db_path)
+            conn.execute('PRAGMA query_only=true')
+            self._read_pool.put(conn)
+        
         logger.info("Connected to SQLite database")
     
+    def _connect_sqlite(self, db_path: str) -> sqlite3.Connection:
+        """Open a SQLite connection with the per-connection pragmas applied"""
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # busy_timeout waits for the lock instead of failing with "database is locked"
+        conn.executescript('''
+            PRAGMA synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-16384;
+            PRAGMA mmap_size=268435456;
+        ''')
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """Borrow a read-only connection from the pool"""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+    
+    @contextmanager
+    def _writer(self):
+        """Hold the single writer connection for the duration of a write"""
+        with self._write_lock:
+            yield self.sqlite_conn
+    
     def create_user(self, user_data: Dict[str, Any]) -> Dict[str, str]:
         """Create a new user"""
-        user_id = f"SCR{datetime.now().strftime('%Y%m%d')}{secrets.token_hex(3).upper()}"
+        now = datetime.now()
+        user_id = f"SCR{now.strftime('%Y%m%d')}{secrets.token_hex(3).upper()}"
         password = secrets.token_urlsafe(8)
         password_hash = generate_password_hash(password)
         
         user_data.update({
             'user_id': user_id,
             'password_hash': password_hash,
-            'created_at': datetime.now().isoformat()
+            'created_at': now.isoformat()
         })
         
         if self.use_mongodb:
             self.mongo_db.users.insert_one(user_data)
         else:
-            self.sqlite_conn.execute('''
-                INSERT INTO users (user_id, name, pan, email, mobile, dob, password_hash, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, user_data['name'], user_data['pan'], user_data['email'],
-                  user_data['mobile'], user_data['dob'], password_hash, user_data['created_at']))
-            self.sqlite_conn.commit()
+            with self._writer() as conn:
+                conn.execute('''
+                    INSERT INTO users (user_id, name, pan, email, mobile, dob, password_hash, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, user_data['name'], user_data['pan'], user_data['email'],
+                      user_data['mobile'], user_data['dob'], password_hash, user_data['created_at']))
+                conn.commit()
         
         return {'user_id': user_id, 'password': password}
     
     def authenticate_user(self, user_id: str, password: str) -> Optional[Dict[str, Any]]:
         """Authenticate user credentials"""
+        cache_key = self.auth_cache.make_key(user_id, password)
+        hit, cached_user = self.auth_cache.get(cache_key)
+        if hit:
+            return dict(cached_user) if cached_user is not None else None
+        
+        result = None
         if self.use_mongodb:
             user = self.mongo_db.users.find_one({'user_id': user_id})
             if user and check_password_hash(user['password_hash'], password):
-                return dict(user)
+                result = dict(user)
         else:
-            cursor = self.sqlite_conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-            user = cursor.fetchone()
+            with self._reader() as conn:
+                user = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
             if user and check_password_hash(user['password_hash'], password):
-                return dict(user)
-        return None
+                result = dict(user)
+        
+        self.auth_cache.put(cache_key, result)
+        return dict(result) if result is not None else None
+    
+    def authenticate_and_fetch_complaint(self, user_id: str, password: str,
+                                         complaint_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Check credentials and fetch a complaint in a single database round trip
+        
+        Args:
+            user_id: User ID to authenticate
+            password: Password to check
+            complaint_id: Complaint to fetch
+            
+        Returns:
+            (authenticated, complaint). The complaint is returned whoever owns it,
+            so callers can tell "not found" from "access denied"; its files are
+            not loaded.
+        """
+        password_hash, complaint = None, None
+        if self.use_mongodb:
+            rows = list(self.mongo_db.users.aggregate([
+                {'$match': {'user_id': user_id}},
+                {'$lookup': {
+                    'from': 'complaints',
+                    'pipeline': [{'$match': {'complaint_id': complaint_id}}],
+                    'as': 'complaint'
+                }}
+            ]))
+            if rows:
+                password_hash = rows[0]['password_hash']
+                complaint = rows[0]['complaint'][0] if rows[0]['complaint'] else None
+        else:
+            with self._reader() as conn:
+                row = conn.execute('''
+                    SELECT u.password_hash, c.* FROM users u
+                    LEFT JOIN complaints c ON c.complaint_id = ?
+                    WHERE u.user_id = ?
+                ''', (complaint_id, user_id)).fetchone()
+            if row:
+                password_hash = row['password_hash']
+                complaint = dict(row)
+                del complaint['password_hash']
+                if complaint['complaint_id'] is None:
+                    complaint = None
+        
+        if password_hash is None:
+            return False, None
+        
+        cache_key = self.auth_cache.make_key(user_id, password)
+        hit, cached_user = self.auth_cache.get(cache_key)
+        if hit:
+            authenticated = cached_user is not None
+        else:
+            # Only the verdict is cached here; the full user row isn't loaded
+            authenticated = check_password_hash(password_hash, password)
+            if not authenticated:
+                self.auth_cache.put(cache_key, None)
+        return authenticated, (complaint if authenticated else None)
     
     def create_complaint(self, complaint_data: Dict[str, Any]) -> str:
         """Create a new complaint"""
-        complaint_id = f"SCR{datetime.now().strftime('%Y%m%d%H%M%S')}{secrets.token_hex(2).upper()}"
+        now = datetime.now()
+        current_time = now.isoformat()
+        complaint_id = f"SCR{now.strftime('%Y%m%d%H%M%S')}{secrets.token_hex(2).upper()}"
         
         complaint_data.update({
             'complaint_id': complaint_id,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat(),
+            'created_at': current_time,
+            'updated_at': current_time,
             'status': 'submitted'
         })
         
         if self.use_mongodb:
             self.mongo_db.complaints.insert_one(complaint_data)
-            # Add to history
-            self.mongo_db.complaint_history.insert_one({
-                'complaint_id': complaint_id,
-                'status': 'submitted',
-                'notes': 'Complaint submitted',
-                'created_at': datetime.now().isoformat()
-            })
         else:
-            files_json = json.dumps(complaint_data.get('files', []))
-            self.sqlite_conn.execute('''
-                INSERT INTO complaints (complaint_id, user_id, entity_type, category, description, files, status, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (complaint_id, complaint_data['user_id'], complaint_data['entity_type'],
-                  complaint_data['category'], complaint_data['description'], files_json,
-                  'submitted', complaint_data['created_at'], complaint_data['updated_at']))
-            
-            # Add to history
-            self.sqlite_conn.execute('''
-                INSERT INTO complaint_history (complaint_id, status, notes, created_at)
-                VALUES (?, ?, ?, ?)
-            ''', (complaint_id, 'submitted', 'Complaint submitted', datetime.now().isoformat()))
-            
-            self.sqlite_conn.commit()
+            with self._writer() as conn, conn:
+                conn.execute('''
+                    INSERT INTO complaints (complaint_id, user_id, entity_type, category, description, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (complaint_id, complaint_data['user_id'], complaint_data['entity_type'],
+                      complaint_data['category'], complaint_data['description'],
+                      'submitted', complaint_data['created_at'], complaint_data['updated_at']))
+                conn.executemany(
+                    'INSERT INTO complaint_files (complaint_id, ord, filename) VALUES (?, ?, ?)',
+                    [(complaint_id, i, name) for i, name in enumerate(complaint_data.get('files', []))]
+                )
+        
+        # Add to history
+        self.history_writer.add({
+            'complaint_id': complaint_id,
+            'status': 'submitted',
+            'notes': 'Complaint submitted',
+            'created_at': current_time
+        })
         
         return complaint_id
     
+    def _write_history_batch(self, entries: List[Dict[str, Any]]):
+        """Persist a batch of complaint history entries in a single operation"""
+        if self.use_mongodb:
+            # The history is an audit trail, so writes are unacknowledged (w=0)
+            history = self.mongo_db.complaint_history.with_options(write_concern=WriteConcern(w=0))
+            history.bulk_write(
+                [InsertOne(entry) for entry in entries], ordered=False
+            )
+        else:
+            with self._writer() as conn, conn:
+                conn.executemany('''
+                    INSERT INTO complaint_history (complaint_id, status, notes, created_at)
+                    VALUES (?, ?, ?, ?)
+                ''', [(e['complaint_id'], e['status'], e['notes'], e['created_at']) for e in entries])
+    
     def get_complaint(self, complaint_id: str) -> Optional[Dict[str, Any]]:
         """Get complaint by ID"""
         if self.use_mongodb:
@@ -223,14 +516,15 @@ class DatabaseManager:
             if complaint:
                 return dict(complaint)
         else:
-            cursor = self.sqlite_conn.execute('SELECT * FROM complaints WHERE complaint_id = ?', (complaint_id,))
-            complaint = cursor.fetchone()
-            if complaint:
-                complaint_dict = dict(complaint)
-                # Parse files JSON
-                if complaint_dict.get('files'):
-                    complaint_dict['files'] = json.loads(complaint_dict['files'])
-                return complaint_dict
+            with self._reader() as conn:
+                complaint = conn.execute('SELECT * FROM complaints WHERE complaint_id = ?', (complaint_id,)).fetchone()
+                if complaint:
+                    complaint_dict = dict(complaint)
+                    complaint_dict['files'] = [row[0] for row in conn.execute(
+                        'SELECT filename FROM complaint_files WHERE complaint_id = ? ORDER BY ord',
+                        (complaint_id,)
+                    )]
+                    return complaint_dict
         return None
     
     def update_complaint_status(self, complaint_id: str, status: str, notes: str = None) -> bool:
@@ -242,24 +536,19 @@ class DatabaseManager:
                 {'complaint_id': complaint_id},
                 {'$set': {'status': status, 'updated_at': current_time}}
             )
-            # Add to history
-            self.mongo_db.complaint_history.insert_one({
-                'complaint_id': complaint_id,
-                'status': status,
-                'notes': notes,
-                'created_at': current_time
-            })
         else:
-            self.sqlite_conn.execute('''
-                UPDATE complaints SET status = ?, updated_at = ? WHERE complaint_id = ?
-            ''', (status, current_time, complaint_id))
-            
-            self.sqlite_conn.execute('''
-                INSERT INTO complaint_history (complaint_id, status, notes, created_at)
-                VALUES (?, ?, ?, ?)
-            ''', (complaint_id, status, notes, current_time))
-            
-            self.sqlite_conn.commit()
+            with self._writer() as conn, conn:
+                conn.execute('''
+                    UPDATE complaints SET status = ?, updated_at = ? WHERE complaint_id = ?
+                ''', (status, current_time, complaint_id))
+        
+        # Add to history
+        self.history_writer.add({
+            'complaint_id': complaint_id,
+            'status': status,
+            'notes': notes,
+            'created_at': current_time
+        })
         
         return True
     
@@ -271,14 +560,23 @@ class DatabaseManager:
             cursor = self.mongo_db.complaints.find({'user_id': user_id}).sort('created_at', -1)
             complaints = [dict(complaint) for complaint in cursor]
         else:
-            cursor = self.sqlite_conn.execute(
-                'SELECT * FROM complaints WHERE user_id = ? ORDER BY created_at DESC',
-                (user_id,)
-            )
-            for row in cursor.fetchall():
+            with self._reader() as conn:
+                rows = conn.execute(
+                    'SELECT * FROM complaints WHERE user_id = ? ORDER BY created_at DESC',
+                    (user_id,)
+                ).fetchall()
+                file_rows = conn.execute('''
+                    SELECT f.complaint_id, f.filename FROM complaint_files f
+                    JOIN complaints c ON c.complaint_id = f.complaint_id
+                    WHERE c.user_id = ? ORDER BY f.complaint_id, f.ord
+                ''', (user_id,)).fetchall()
+            
+            files_by_complaint = {}
+            for complaint_id, filename in file_rows:
+                files_by_complaint.setdefault(complaint_id, []).append(filename)
+            for row in rows:
                 complaint = dict(row)
-                if complaint.get('files'):
-                    complaint['files'] = json.loads(complaint['files'])
+                complaint['files'] = files_by_complaint.get(complaint['complaint_id'], [])
                 complaints.append(complaint)
         
         return complaints
@@ -286,9 +584,60 @@ class DatabaseManager:
 # Initialize database
 db = DatabaseManager()
 
+def issue_session_token(user_id: str) -> str:
+    """Issue a signed, expiring session token so later calls can skip the password KDF"""
+    payload = f"{user_id}.{int(time.time()) + SESSION_TOKEN_TTL}"
+    signature = hmac.new(app.config['SECRET_KEY'].encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature}"
+
+def verify_session_token(token: str) -> Optional[str]:
+    """Return the user ID a valid, unexpired session token was issued for"""
+    try:
+        user_id, expires_at, signature = token.rsplit('.', 2)
+        expires_at = int(expires_at)
+    except (AttributeError, ValueError):
+        return None
+    payload = f"{user_id}.{expires_at}"
+    expected = hmac.new(app.config['SECRET_KEY'].encode(), payload.encode(), hashlib.sha256).hexdigest()
+    if expires_at < time.time() or not hmac.compare_digest(signature, expected):
+        return None
+    return user_id
+
+def authenticate(user_id: str, password: Optional[str], token: Optional[str] = None) -> bool:
+    """Authenticate a request by session token when one is given, else by password"""
+    if token and verify_session_token(token) == user_id:
+        return True
+    if not user_id or not password:
+        return False
+    return db.authenticate_user(user_id, password) is not None
+
+def authenticate_and_fetch(user_id: str, password: Optional[str], token: Optional[str],
+                           complaint_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Authenticate a request and fetch the complaint it targets"""
+    if token and verify_session_token(token) == user_id:
+        return True, db.get_complaint(complaint_id)
+    if not user_id or not password:
+        return False, None
+    return db.authenticate_and_fetch_complaint(user_id, password, complaint_id)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    dot = filename.rfind('.')
+    return dot != -1 and filename[dot + 1:].lower() in ALLOWED_EXTENSIONS
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value: str) -> float:
+    """Parse a stored ISO timestamp into a Unix time (stored timestamps never change)"""
+    return datetime.fromisoformat(value).timestamp()
+
+def uploaded_file_size(file) -> int:
+    """Size of an uploaded file, measured by seeking rather than reading it into memory"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
 
 def init_rag_system():
     """Initialize RAG system for query forwarding"""
@@ -309,7 +658,7 @@ def init_rag_system():
         documents = rag_system.load_documents(min_word_count=50)
         rag_system.setup_embeddings()
         rag_system.create_vector_store()
-        rag_system.setup_llm()
+        rag_system.setup_llm(streaming=False)
         rag_system.create_qa_chain()
         
         logger.info("RAG system initialized successfully")
@@ -329,12 +678,12 @@ def index():
 @app.route('/styles.css')
 def serve_css():
     """Serve CSS file"""
-    return send_from_directory('.', 'styles.css')
+    return send_from_directory('.', 'styles.css', conditional=True, max_age=STATIC_MAX_AGE)
 
 @app.route('/script.js')
 def serve_js():
     """Serve JavaScript file"""
-    return send_from_directory('.', 'script.js')
+    return send_from_directory('.', 'script.js', conditional=True, max_age=STATIC_MAX_AGE)
 
 @app.route('/index.html')
 def serve_main_index():
@@ -342,15 +691,21 @@ def serve_main_index():
     from flask import redirect
     return redirect('http://127.0.0.1:5000/', code=302)
 
+_HEALTH_CACHE = [b"", None]
+
 @app.route('/api/health')
 def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'database': 'mongodb' if db.use_mongodb else 'sqlite',
-        'rag_system_available': rag_system is not None
-    })
+    """Health check endpoint (body is serialized at most once per second)"""
+    key = (int(time.time()), rag_system is not None)
+    if key != _HEALTH_CACHE[1]:
+        body = app.json.dumps({
+            'status': 'healthy',
+            'timestamp': datetime.fromtimestamp(key[0]).isoformat(),
+            'database': 'mongodb' if db.use_mongodb else 'sqlite',
+            'rag_system_available': key[1]
+        })
+        _HEALTH_CACHE[:] = [body.encode(), key]
+    return Response(_HEALTH_CACHE[0], mimetype='application/json')
 
 @app.route('/api/register', methods=['POST'])
 def register_user():
@@ -382,7 +737,8 @@ def register_user():
             'success': True,
             'message': 'Registration successful',
             'user_id': credentials['user_id'],
-            'password': credentials['password']
+            'password': credentials['password'],
+            'session_token': issue_session_token(credentials['user_id'])
         })
         
     except Exception as e:
@@ -401,6 +757,7 @@ def lodge_complaint():
         if request.content_type.startswith('multipart/form-data'):
             user_id = request.form.get('user_id')
             password = request.form.get('password')
+            token = request.form.get('token')
             entity_type = request.form.get('entity_type')
             category = request.form.get('category')
             description = request.form.get('description')
@@ -409,13 +766,14 @@ def lodge_complaint():
             data = request.get_json()
             user_id = data.get('user_id')
             password = data.get('password')
+            token = data.get('token')
             entity_type = data.get('entity_type')
             category = data.get('category')
             description = data.get('description')
             files = []
         
         # Validate authentication
-        user = db.authenticate_user(user_id, password)
+        user = authenticate(user_id, password, token)
         if not user:
             return jsonify({
                 'success': False,
@@ -431,12 +789,15 @@ def lodge_complaint():
         
         # Handle file uploads
         uploaded_files = []
+        upload_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         if len(files) > 10:
             return jsonify({
                 'success': False,
                 'error': 'Maximum 10 files allowed'
             }), 400
         
+        # Validate every file before writing any of them to disk
+        pending_saves = []
         for file in files:
             if file and file.filename:
                 if not allowed_file(file.filename):
@@ -445,20 +806,24 @@ def lodge_complaint():
                         'error': f'File type not allowed: {file.filename}'
                     }), 400
                 
-                if len(file.read()) > 20 * 1024 * 1024:  # 20MB limit per file
+                if uploaded_file_size(file) > MAX_FILE_SIZE:
                     return jsonify({
                         'success': False,
                         'error': f'File too large: {file.filename} (max 20MB per file)'
                     }), 400
                 
-                file.seek(0)  # Reset file pointer after read
                 filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                unique_filename = f"{timestamp}_{filename}"
+                # The random part keeps same-named uploads (in this request or a
+                # concurrent one) from saving over each other in parallel
+                unique_filename = f"{upload_timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
                 file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+                pending_saves.append((file, file_path))
                 uploaded_files.append(unique_filename)
         
+        # Blocking disk writes release the GIL, so the saves overlap
+        for future in [UPLOAD_EXECUTOR.submit(file.save, path) for file, path in pending_saves]:
+            future.result()
+        
         # Create complaint
         complaint_data = {
             'user_id': user_id,
@@ -473,7 +838,8 @@ def lodge_complaint():
         return jsonify({
             'success': True,
             'message': 'Complaint lodged successfully',
-            'complaint_id': complaint_id
+            'complaint_id': complaint_id,
+            'session_token': issue_session_token(user_id)
         })
         
     except Exception as e:
@@ -498,16 +864,14 @@ def track_complaint():
         user_id = data.get('user_id')
         password = data.get('password')
         
-        # Validate authentication
-        user = db.authenticate_user(user_id, password)
-        if not user:
+        # Validate authentication and get complaint
+        authenticated, complaint = authenticate_and_fetch(user_id, password, data.get('token'), complaint_id)
+        if not authenticated:
             return jsonify({
                 'success': False,
                 'error': 'Invalid credentials'
             }), 401
         
-        # Get complaint
-        complaint = db.get_complaint(complaint_id)
         if not complaint:
             return jsonify({
                 'success': False,
@@ -522,8 +886,7 @@ def track_complaint():
             }), 403
         
         # Calculate days since submission
-        created_at = datetime.fromisoformat(complaint['created_at'])
-        days_elapsed = (datetime.now() - created_at).days
+        days_elapsed = int((time.time() - parse_timestamp(complaint['created_at'])) // 86400)
         
         # Determine reminders and next actions
         reminders = []
@@ -566,16 +929,14 @@ def escalate_complaint():
         user_id = data.get('user_id')
         password = data.get('password')
         
-        # Validate authentication
-        user = db.authenticate_user(user_id, password)
-        if not user:
+        # Validate authentication and get complaint
+        authenticated, complaint = authenticate_and_fetch(user_id, password, data.get('token'), complaint_id)
+        if not authenticated:
             return jsonify({
                 'success': False,
                 'error': 'Invalid credentials'
             }), 401
         
-        # Get complaint
-        complaint = db.get_complaint(complaint_id)
         if not complaint:
             return jsonify({
                 'success': False,
@@ -632,16 +993,14 @@ def close_complaint():
         password = data.get('password')
         feedback = data.get('feedback', '')
         
-        # Validate authentication
-        user = db.authenticate_user(user_id, password)
-        if not user:
+        # Validate authentication and get complaint
+        authenticated, complaint = authenticate_and_fetch(user_id, password, data.get('token'), complaint_id)
+        if not authenticated:
             return jsonify({
                 'success': False,
                 'error': 'Invalid credentials'
             }), 401
         
-        # Get complaint
-        complaint = db.get_complaint(complaint_id)
         if not complaint:
             return jsonify({
                 'success': False,
@@ -715,13 +1074,26 @@ def query_rag():
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     """Serve uploaded files"""
+    if UPLOADS_ACCEL_PREFIX:
+        # Hand the transfer to nginx (internal location aliased to the upload
+        # folder) so the bytes go out via sendfile without touching Python
+        if safe_join(app.config['UPLOAD_FOLDER'], filename) is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        response = Response(status=200)
+        response.headers['X-Accel-Redirect'] = f"{UPLOADS_ACCEL_PREFIX.rstrip('/')}/{filename}"
+        return response
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+# Under a WSGI server (e.g. `gunicorn -k gthread -w 4 --threads 8 -b 0.0.0.0:5001
+# --chdir scores app_scores:app`) the __main__ block never runs, so initialize here
+if __name__ != '__main__' and os.getenv('SEBI_RAG_AUTOINIT') == '1':
+    init_rag_system()
+
 if __name__ == '__main__':
     logger.info("Starting SCORES Flask Application...")
     
     # Initialize RAG system
     init_rag_system()
     
-    # Run Flask app
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Run Flask app (development server; the debugger is opt-in via FLASK_DEBUG)
+    app.run(host='0.0.0.0', port=5001, debug=os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true'))
@@ -332,7 +332,7 @@ class SCORESChatbot {
                         { text: 'Not Now', action: () => this.resetWorkflow() }
                     ]
                 });
-                this.currentSession = { user_id: result.user_id, password: result.password };
+                this.currentSession = { user_id: result.user_id, password: result.password, token: result.session_token };
             } else {
                 this.addMessage('bot', `❌ **Registration Failed**\n\n${result.error || 'Please try again later.'}`);
             }
@@ -446,6 +446,9 @@ class SCORESChatbot {
             const formData = new FormData();
             formData.append('user_id', this.workflowData.user_id);
             formData.append('password', this.workflowData.password);
+            if (this.workflowData.token) {
+                formData.append('token', this.workflowData.token);
+            }
             formData.append('entity_type', this.workflowData.entity_type);
             formData.append('category', this.workflowData.category);
             formData.append('description', this.workflowData.description);
@@ -463,6 +466,11 @@ class SCORESChatbot {
             const result = await response.json();
 
             if (result.success) {
+                this.currentSession = {
+                    user_id: this.workflowData.user_id,
+                    password: this.workflowData.password,
+                    token: result.session_token
+                };
                 this.addMessage('bot', `✅ **Complaint Lodged Successfully!**\n\n**Complaint ID:** ${result.complaint_id}\n\n📝 **Next Steps:**\n• You'll receive acknowledgment within 7 days\n• Entity has 21 days to respond\n• You can track status anytime\n\nWould you like to track this complaint now?`, {
                     buttons: [
                         { text: 'Track Complaint', action: () => this.startTrackingWorkflow(result.complaint_id) },
@@ -600,6 +608,7 @@ class SCORESChatbot {
             case 2: // With current session
                 this.workflowData.user_id = this.currentSession.user_id;
                 this.workflowData.password = this.currentSession.password;
+                this.workflowData.token = this.currentSession.token;
                 this.trackComplaint();
                 break;
         }
@@ -617,7 +626,8 @@ class SCORESChatbot {
                 body: JSON.stringify({
                     complaint_id: this.workflowData.complaint_id,
                     user_id: this.workflowData.user_id,
-                    password: this.workflowData.password
+                    password: this.workflowData.password,
+                    token: this.workflowData.token
                 })
             });
 
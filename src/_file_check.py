@@ -0,0 +1,35 @@
+import os
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+def verify_files(paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split paths into those that exist and those that are missing
+
+    Paths are grouped by parent directory and each directory is listed with
+    a single scandir call, instead of one stat per file.
+
+    Args:
+        paths: File paths, relative to the current directory or absolute
+
+    Returns:
+        (present, missing), each in the order the paths were given
+    """
+    paths = list(paths)
+
+    by_parent = defaultdict(list)
+    for path in paths:
+        by_parent[os.path.dirname(path) or '.'].append(path)
+
+    present_set = set()
+    for parent, children in by_parent.items():
+        try:
+            with os.scandir(parent) as entries:
+                names = {entry.name for entry in entries}
+        except OSError:
+            continue  # Missing or unreadable directory: all its files are missing
+        present_set.update(path for path in children if os.path.basename(path) in names)
+
+    present = [path for path in paths if path in present_set]
+    missing = [path for path in paths if path not in present_set]
+    return present, missing
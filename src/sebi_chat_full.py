@@ -6,6 +6,7 @@ Interactive CLI for querying ALL SEBI documents using RAG pipeline
 
 import os
 import sys
+import ntpath
 import json
 import time
 from typing import Optional, Dict
@@ -186,7 +187,8 @@ def main():
                         
                         for i, source in enumerate(result['sources'][:5], 1):  # Show top 5 sources
                             print(f"{i}. {source['doc_type'].replace('_', ' ').title()} ({source.get('year', 'N/A')})")
-                            print(f"   File: {source['source_file'].split('/')[-1] if '/' in source['source_file'] else source['source_file'].split('\\\\')[-1]}")
+                            # ntpath splits on both / and \ separators, so Windows paths work too
+                            print(f"   File: {ntpath.basename(source['source_file'])}")
                             print(f"   Quality Score: {source['quality_score']:.1f}")
                             print(f"   Preview: {source['content_preview']}")
                             print()
@@ -1,11 +1,101 @@
+import os
+import re
 import json
+import mmap
 import logging
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from langchain.schema import Document
 from pathlib import Path
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Files larger than this are parsed in parallel across processes, in byte ranges
+# of about PARALLEL_RANGE_SIZE; at most PARALLEL_RANGES_PER_WORKER ranges per
+# worker are parsed ahead of the consumer, so streaming memory stays bounded
+PARALLEL_PARSE_THRESHOLD = 50 * 1024 * 1024
+PARALLEL_RANGE_SIZE = 8 * 1024 * 1024
+PARALLEL_RANGES_PER_WORKER = 2
+
+# Year patterns like 2020-21, 2021-2022, etc., in priority order
+YEAR_PATTERNS = [
+    re.compile(r'(\d{4})-(\d{4})'),  # 2020-2021
+    re.compile(r'(\d{4})-(\d{2})'),   # 2020-21
+    re.compile(r'(\d{4})'),           # 2020
+]
+
+# Path substring -> document type, checked in order
+DOC_TYPE_MARKERS = (
+    ('annual_report', 'annual_report'),
+    ('mastercircular', 'master_circular'),
+    ('faq', 'faq'),
+)
+
+# Every chunk of a PDF shares its path, so both lookups are memoized per path
+@lru_cache(maxsize=None)
+def doc_type_for_path(pdf_path: str) -> str:
+    """Classify a PDF path into a document type"""
+    pdf_path_lower = pdf_path.lower()
+    for marker, doc_type in DOC_TYPE_MARKERS:
+        if marker in pdf_path_lower:
+            return doc_type
+    return 'other'
+
+@lru_cache(maxsize=None)
+def year_for_path(pdf_path: str) -> Optional[str]:
+    """Extract the (first) year from a PDF path"""
+    for pattern in YEAR_PATTERNS:
+        match = pattern.search(pdf_path)
+        if match:
+            return match.group(1)
+    return None
+
+@dataclass
+class RawChunk:
+    """Compact chunk record; LangChain Documents are only built when a chunk is embedded"""
+    # Declared by hand: dataclass(slots=True) needs Python 3.10, we support 3.8+
+    __slots__ = ('text', 'chunk_id', 'chunk_index', 'word_count', 'char_count',
+                 'doc_type', 'year', 'quality_score', 'source', 'file_size')
+    
+    text: str
+    chunk_id: str
+    chunk_index: int
+    word_count: int
+    char_count: int
+    doc_type: str
+    year: Optional[str]
+    quality_score: float
+    source: str
+    file_size: int
+    
+    @property
+    def metadata(self) -> Dict:
+        """Document metadata for this chunk"""
+        return {
+            'source': self.source,
+            'chunk_id': self.chunk_id,
+            'chunk_index': self.chunk_index,
+            'word_count': self.word_count,
+            'char_count': self.char_count,
+            'doc_type': self.doc_type,
+            'year': self.year,
+            'original_quality_score': self.quality_score,
+            'file_size_bytes': self.file_size
+        }
+    
+    def to_document(self) -> Document:
+        """Materialize the chunk as a LangChain Document"""
+        return Document(page_content=self.text, metadata=self.metadata)
+
 class SEBIDocumentLoader:
     """Custom document loader for SEBI chunked data"""
     
@@ -20,56 +110,157 @@ class SEBIDocumentLoader:
         self.file_path = file_path
         self.min_word_count = min_word_count
         self.documents = []
+        self.total_chunks = 0
+        self.filtered_chunks = 0
         
     def load(self) -> List[Document]:
         """Load and convert JSONL chunks to LangChain Documents"""
+        documents = [chunk.to_document() for chunk in self.load_raw()]
+        self.documents = documents
+        return documents
+    
+    def load_raw(self) -> List[RawChunk]:
+        """Load JSONL chunks as RawChunks without building Documents"""
         
         logger.info(f"Loading documents from {self.file_path}")
         
         if not Path(self.file_path).exists():
             raise FileNotFoundError(f"File not found: {self.file_path}")
         
-        documents = []
-        total_chunks = 0
-        filtered_chunks = 0
-        
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    try:
-                        chunk_data = json.loads(line.strip())
-                        total_chunks += 1
-                        
-                        # Filter by minimum word count
-                        if chunk_data.get('chunk_word_count', 0) < self.min_word_count:
-                            filtered_chunks += 1
-                            continue
-                        
-                        # Create LangChain Document
-                        doc = self._create_document(chunk_data)
-                        if doc:
-                            documents.append(doc)
-                            
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error at line {line_num}: {e}")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error processing chunk at line {line_num}: {e}")
-                        continue
+            chunks = list(self.iter_chunks())
         
         except Exception as e:
             logger.error(f"Error reading file {self.file_path}: {e}")
             raise
         
-        logger.info(f"Loaded {len(documents)} documents from {total_chunks} total chunks")
-        logger.info(f"Filtered out {filtered_chunks} chunks below {self.min_word_count} words")
+        logger.info(f"Loaded {len(chunks)} documents from {self.total_chunks} total chunks")
+        logger.info(f"Filtered out {self.filtered_chunks} chunks below {self.min_word_count} words")
         
-        self.documents = documents
-        return documents
+        return chunks
+    
+    def iter_chunks(self) -> Iterator[RawChunk]:
+        """
+        Stream RawChunks in file order without holding the corpus in memory
+        
+        Large files are parsed by a process pool in byte ranges, a bounded
+        number of ranges ahead of the consumer. total_chunks and
+        filtered_chunks are complete once the iterator is exhausted.
+        """
+        if not Path(self.file_path).exists():
+            raise FileNotFoundError(f"File not found: {self.file_path}")
+        
+        file_size = os.path.getsize(self.file_path)
+        workers = os.cpu_count() or 1
+        if file_size > PARALLEL_PARSE_THRESHOLD and workers > 1:
+            yield from self._iter_parallel(file_size, workers)
+        else:
+            yield from self._iter_chunks(self._iter_lines())
+    
+    def iter_documents(self) -> Iterator[Document]:
+        """Stream LangChain Documents one line at a time"""
+        for chunk in self.iter_chunks():
+            yield chunk.to_document()
+    
+    def _iter_parallel(self, file_size: int, workers: int) -> Iterator[RawChunk]:
+        """Parse byte ranges across a process pool, yielding their chunks in file order"""
+        ranges = iter(self._split_ranges(file_size, max(workers, file_size // PARALLEL_RANGE_SIZE)))
+        logger.info(f"Parsing {file_size / 1e6:.0f} MB across {workers} processes")
+        
+        self.total_chunks = 0
+        self.filtered_chunks = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def submit(byte_range):
+                start, end = byte_range
+                return pool.submit(_parse_range, self.file_path, start, end, self.min_word_count)
+            
+            pending = deque(submit(r) for r in islice(ranges, workers * PARALLEL_RANGES_PER_WORKER))
+            while pending:
+                range_chunks, range_total, range_filtered = pending.popleft().result()
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    pending.append(submit(next_range))
+                
+                self.total_chunks += range_total
+                self.filtered_chunks += range_filtered
+                yield from range_chunks
+    
+    def _split_ranges(self, file_size: int, parts: int) -> List[Tuple[int, int]]:
+        """Split the file into roughly equal byte ranges that start at line boundaries"""
+        with open(self.file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                starts = [0]
+                for i in range(1, parts):
+                    newline = mm.find(b'\n', max(file_size * i // parts, starts[-1]))
+                    if newline == -1:
+                        break
+                    if newline + 1 > starts[-1]:
+                        starts.append(newline + 1)
+        ends = starts[1:] + [file_size]
+        return [(start, end) for start, end in zip(starts, ends) if start < end]
+    
+    def _parse_lines(self, lines: Iterable[bytes]) -> Tuple[List[RawChunk], int, int]:
+        """
+        Parse JSONL lines into RawChunks
+        
+        Returns:
+            The chunks, the number of chunks parsed and the number filtered out
+        """
+        chunks = list(self._iter_chunks(lines))
+        return chunks, self.total_chunks, self.filtered_chunks
+    
+    def _iter_chunks(self, lines: Iterable[bytes]) -> Iterator[RawChunk]:
+        """Parse JSONL lines into RawChunks lazily, counting parsed and filtered chunks"""
+        self.total_chunks = 0
+        self.filtered_chunks = 0
+        
+        for line_num, line in enumerate(lines, 1):
+            try:
+                chunk_data = json_loads(line)
+                self.total_chunks += 1
+                
+                # Filter by minimum word count
+                if chunk_data.get('chunk_word_count', 0) < self.min_word_count:
+                    self.filtered_chunks += 1
+                    continue
+                
+                chunk = self._create_chunk(chunk_data)
+                    
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON decode error at line {line_num}: {e}")
+                continue
+            except Exception as e:
+                logger.error(f"Error processing chunk at line {line_num}: {e}")
+                continue
+            
+            if chunk:
+                yield chunk
+    
+    def _iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield raw JSONL lines in [start, end) from a read-only memory map of the file"""
+        with open(self.file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                size = len(mm) if end is None else end
+                while pos < size:
+                    line_end = mm.find(b'\n', pos, size)
+                    if line_end == -1:
+                        line_end = size
+                    # Surrounding whitespace (including \r) is valid JSON, so no strip()
+                    yield mm[pos:line_end]
+                    pos = line_end + 1
     
     def _create_document(self, chunk_data: Dict) -> Optional[Document]:
         """Convert chunk data to LangChain Document"""
         
+        chunk = self._create_chunk(chunk_data)
+        return chunk.to_document() if chunk else None
+    
+    def _create_chunk(self, chunk_data: Dict) -> Optional[RawChunk]:
+        """Extract the text and metadata fields for a chunk"""
+        
         text = chunk_data.get('chunk_text', '').strip()
         if not text:
             return None
@@ -81,54 +272,26 @@ class SEBIDocumentLoader:
         # Extract year from path (for annual reports)
         year = self._extract_year(pdf_path)
         
-        # Create metadata
-        metadata = {
-            'source': pdf_path,
-            'chunk_id': chunk_data.get('chunk_id', ''),
-            'chunk_index': chunk_data.get('chunk_index', 0),
-            'word_count': chunk_data.get('chunk_word_count', 0),
-            'char_count': chunk_data.get('chunk_char_count', 0),
-            'doc_type': doc_type,
-            'year': year,
-            'original_quality_score': chunk_data.get('processing_metadata', {}).get('original_quality_score', 0),
-            'file_size_bytes': chunk_data.get('original_file_size_bytes', 0)
-        }
-        
-        return Document(
-            page_content=text,
-            metadata=metadata
+        return RawChunk(
+            text=text,
+            chunk_id=chunk_data.get('chunk_id', ''),
+            chunk_index=chunk_data.get('chunk_index', 0),
+            word_count=chunk_data.get('chunk_word_count', 0),
+            char_count=chunk_data.get('chunk_char_count', 0),
+            doc_type=doc_type,
+            year=year,
+            quality_score=chunk_data.get('processing_metadata', {}).get('original_quality_score', 0),
+            source=pdf_path,
+            file_size=chunk_data.get('original_file_size_bytes', 0)
         )
     
     def _extract_doc_type(self, pdf_path: str) -> str:
         """Extract document type from PDF path"""
-        pdf_path_lower = pdf_path.lower()
-        
-        if 'annual_report' in pdf_path_lower:
-            return 'annual_report'
-        elif 'mastercircular' in pdf_path_lower:
-            return 'master_circular'
-        elif 'faq' in pdf_path_lower:
-            return 'faq'
-        else:
-            return 'other'
+        return doc_type_for_path(pdf_path)
     
     def _extract_year(self, pdf_path: str) -> Optional[str]:
         """Extract year from PDF path (mainly for annual reports)"""
-        import re
-        
-        # Look for year patterns like 2020-21, 2021-2022, etc.
-        year_patterns = [
-            r'(\d{4})-(\d{4})',  # 2020-2021
-            r'(\d{4})-(\d{2})',   # 2020-21
-            r'(\d{4})',           # 2020
-        ]
-        
-        for pattern in year_patterns:
-            match = re.search(pattern, pdf_path)
-            if match:
-                return match.group(1)  # Return first year
-        
-        return None
+        return year_for_path(pdf_path)
     
     def get_documents_by_type(self, doc_type: str) -> List[Document]:
         """Get documents filtered by type"""
@@ -143,6 +306,12 @@ class SEBIDocumentLoader:
         return [doc for doc in self.documents 
                 if doc.metadata.get('original_quality_score', 0) >= min_quality_score]
 
+def _parse_range(file_path: str, start: int, end: int,
+                 min_word_count: int) -> Tuple[List[RawChunk], int, int]:
+    """Process-pool worker: parse one byte range of a chunk JSONL file"""
+    loader = SEBIDocumentLoader(file_path, min_word_count=min_word_count)
+    return loader._parse_lines(loader._iter_lines(start, end))
+
 # Example usage and testing
 if __name__ == "__main__":
     # Test the loader
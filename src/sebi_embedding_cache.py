@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's default limit on bound parameters per statement
+LOOKUP_BATCH_SIZE = 500
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings proxy that persists document vectors on disk, keyed by model and text"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str,
+                 cache_file: str = "data/embedding_cache/embeddings.sqlite"):
+        """
+        Initialize the embedding cache
+
+        Args:
+            embeddings: Underlying embedding model
+            model_name: Model identifier; vectors from different models never mix
+            cache_file: SQLite file holding the cached vectors
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_file = cache_file
+
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._conn.executescript('''
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL
+            ) WITHOUT ROWID;
+        ''')
+
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> bytes:
+        """Cache key for a text under this model"""
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode('utf-8'), digest_size=16).digest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, running only cache misses through the underlying model"""
+        keys = [self._key(text) for text in texts]
+        cached = {}
+
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[i:i + LOOKUP_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for key, vector in rows:
+                    cached[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), vectors))
+            cached.update(new_entries)
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in new_entries.items()]
+                )
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} computed")
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are not persisted; the RAG system caches them in memory"""
+        return self.embeddings.embed_query(text)
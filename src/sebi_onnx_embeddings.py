@@ -0,0 +1,107 @@
+import os
+import logging
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+FP32_MODEL_FILE = "model.onnx"
+
+class SEBIONNXEmbeddings(Embeddings):
+    """BGE embeddings served by ONNX Runtime, optionally int8-quantized for CPU inference"""
+
+    def __init__(self, model_name: str = "BAAI/bge-small-en-v1.5",
+                 cache_dir: str = "data/onnx_models",
+                 batch_size: int = 64,
+                 max_length: int = 512,
+                 quantize: bool = True):
+        """
+        Initialize the ONNX embedding model, exporting and quantizing it on first use
+
+        Args:
+            model_name: HuggingFace model name (a BGE model; CLS pooling is used)
+            cache_dir: Directory holding exported ONNX models
+            batch_size: Texts per ONNX Runtime session run
+            max_length: Maximum tokens per text
+            quantize: Use dynamic int8 quantization (VNNI GEMMs on supporting CPUs)
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("ONNX embeddings require optimum[onnxruntime]: pip install 'optimum[onnxruntime]'")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        model_dir = os.path.join(cache_dir, model_name.replace('/', '__'))
+        file_name = QUANTIZED_MODEL_FILE if quantize else FP32_MODEL_FILE
+        if not os.path.exists(os.path.join(model_dir, file_name)):
+            self._export(model_name, model_dir, quantize)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, file_name=file_name, provider="CPUExecutionProvider"
+        )
+
+    @staticmethod
+    def _export(model_name: str, model_dir: str, quantize: bool):
+        """Export the model to ONNX and write its dynamic int8 quantization alongside"""
+        logger.info(f"Exporting {model_name} to ONNX in {model_dir}")
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+
+        if quantize:
+            logger.info(f"Quantizing {model_name} to int8")
+            quantizer = ORTQuantizer.from_pretrained(model)
+            config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=model_dir, quantization_config=config)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts into L2-normalized CLS vectors
+        
+        Texts are tokenized once, sorted by token length and batched with their
+        neighbours, so each batch is padded only to its own longest text rather
+        than to the longest text in an arbitrary mix.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        encoded = self.tokenizer(texts, padding=False, truncation=True, max_length=self.max_length)
+        lengths = np.fromiter((len(ids) for ids in encoded['input_ids']), dtype=np.int64, count=len(texts))
+        order = np.argsort(lengths, kind='stable')
+        
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for i in range(0, len(texts), self.batch_size):
+            batch = order[i:i + self.batch_size]
+            inputs = self.tokenizer.pad(
+                {key: [values[j] for j in batch] for key, values in encoded.items()},
+                padding=True,
+                return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            # BGE models are trained with CLS pooling, not mean pooling
+            cls = np.asarray(hidden[:, 0], dtype=np.float32)
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), cls.shape[1]), dtype=np.float32)
+            # Scatter back through the permutation so results keep input order
+            vectors[batch] = cls / np.linalg.norm(cls, axis=1, keepdims=True)
+        
+        return vectors
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
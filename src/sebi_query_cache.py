@@ -0,0 +1,213 @@
+import os
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bump when the persisted layout changes so old cache files are discarded
+CACHE_FORMAT_VERSION = 2
+
+# Embeddings are L2-normalized, so every component lies in [-1, 1] and a single
+# symmetric scale maps them onto int8 without per-dimension ranges
+QUANTIZATION_SCALE = 127
+
+def quantize_embedding(embedding) -> np.ndarray:
+    """Scalar-quantize a normalized embedding to int8"""
+    vector = np.asarray(embedding, dtype=np.float32) * QUANTIZATION_SCALE
+    return np.clip(np.rint(vector), -QUANTIZATION_SCALE, QUANTIZATION_SCALE).astype(np.int8)
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _int8_dot_scores(vectors, count, query):
+        """Dot products of the first count int8 rows with an int32 query, without upcasting the matrix"""
+        scores = np.empty(count, dtype=np.int32)
+        for i in prange(count):
+            acc = np.int32(0)
+            for j in range(vectors.shape[1]):
+                acc += np.int32(vectors[i, j]) * query[j]
+            scores[i] = acc
+        return scores
+else:
+    def _int8_dot_scores(vectors, count, query):
+        """Dot products of the first count int8 rows with an int32 query"""
+        return vectors[:count] @ query
+
+class SEBIQueryCache:
+    """Two-tier cache of RAG query results: exact question match and semantic similarity"""
+
+    def __init__(self, embed_fn: Callable[[str], List[float]],
+                 cache_file: str = "data/query_cache/query_cache.pkl",
+                 max_exact_entries: int = 4096,
+                 max_semantic_entries: int = 10000,
+                 similarity_threshold: float = 0.95):
+        """
+        Initialize the query cache
+
+        Args:
+            embed_fn: Function returning the L2-normalized embedding of a question
+            cache_file: Path used to persist the cache between restarts
+            max_exact_entries: Maximum entries in the exact-match (LRU) tier
+            max_semantic_entries: Maximum entries in the semantic (FIFO) tier
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.embed_fn = embed_fn
+        self.cache_file = cache_file
+        self.max_exact_entries = max_exact_entries
+        self.max_semantic_entries = max_semantic_entries
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint = None
+
+        self._lock = threading.Lock()
+        self._exact = OrderedDict()
+        self._vectors = None  # Ring buffer of int8-quantized question embeddings
+        self._results = []
+        self._next_slot = 0
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        if NUMBA_AVAILABLE:
+            # Compile (or load the cached build of) the kernel now, not on the first lookup
+            _int8_dot_scores(np.zeros((1, 1), dtype=np.int8), 1, np.zeros(1, dtype=np.int32))
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        """Normalize a question into its exact-match key"""
+        return " ".join(question.split()).lower()
+
+    def get(self, question: str) -> Optional[Dict]:
+        """Return a cached result for the question, or None on a miss"""
+        key = self._normalize(question)
+
+        with self._lock:
+            result = self._exact.get(key)
+            if result is not None:
+                self._exact.move_to_end(key)
+                self.exact_hits += 1
+                return dict(result, question=question)
+            has_vectors = bool(self._results)
+
+        if has_vectors:
+            embedding = quantize_embedding(self.embed_fn(question)).astype(np.int32)
+
+            with self._lock:
+                count = len(self._results)
+                if count:
+                    # int8 dot products accumulate in int32; rescale to cosine similarity
+                    scores = _int8_dot_scores(self._vectors, count, embedding) / QUANTIZATION_SCALE ** 2
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self.semantic_hits += 1
+                        return dict(self._results[best], question=question)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, result: Dict):
+        """Store the result of a successfully answered question"""
+        key = self._normalize(question)
+        embedding = quantize_embedding(self.embed_fn(question))
+
+        with self._lock:
+            self._exact[key] = result
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.max_exact_entries:
+                self._exact.popitem(last=False)
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_semantic_entries, embedding.shape[0]), dtype=np.int8)
+
+            # FIFO eviction: overwrite the oldest slot once the buffer is full
+            slot = self._next_slot
+            self._vectors[slot] = embedding
+            if slot < len(self._results):
+                self._results[slot] = result
+            else:
+                self._results.append(result)
+            self._next_slot = (slot + 1) % self.max_semantic_entries
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._exact.clear()
+            self._vectors = None
+            self._results = []
+            self._next_slot = 0
+
+    def load(self, fingerprint: str) -> bool:
+        """
+        Load the persisted cache if it was built against the same documents
+
+        Args:
+            fingerprint: Identifier of the loaded document set; a persisted
+                cache with a different fingerprint is discarded
+        """
+        self.fingerprint = fingerprint
+
+        if not os.path.exists(self.cache_file):
+            return False
+
+        try:
+            with open(self.cache_file, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read query cache {self.cache_file}: {e}")
+            return False
+
+        if state.get('version') != CACHE_FORMAT_VERSION or state.get('fingerprint') != fingerprint:
+            logger.info("Persisted query cache is stale; starting with an empty cache")
+            self.clear()
+            return False
+
+        with self._lock:
+            self._exact = OrderedDict(state['exact'])
+            self._results = state['results']
+            self._vectors = state['vectors']
+            self._next_slot = state['next_slot']
+
+        logger.info(f"Loaded query cache with {len(self._exact)} exact and {len(self._results)} semantic entries")
+        return True
+
+    def save(self):
+        """Persist the cache to disk"""
+        with self._lock:
+            state = {
+                'version': CACHE_FORMAT_VERSION,
+                'fingerprint': self.fingerprint,
+                'exact': list(self._exact.items()),
+                'results': list(self._results),
+                'vectors': None if self._vectors is None else self._vectors.copy(),
+                'next_slot': self._next_slot
+            }
+
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.cache_file)
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters for the cache"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                'exact_entries': len(self._exact),
+                'semantic_entries': len(self._results),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0
+            }
@@ -1,158 +1,630 @@
 import os
 import json
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+import uuid
+import sys
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, Dict, Iterator, Optional
 from datetime import datetime
 from dotenv import load_dotenv
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: only the single-process development server runs there
 
 # Core imports
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
 from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
+from langchain.prompts import ChatPromptTemplate
 from langchain.callbacks import StreamingStdOutCallbackHandler
+from langchain_core.callbacks import BaseCallbackHandler
 
 # Local imports
-from src.sebi_document_loader import SEBIDocumentLoader
+from src.sebi_document_loader import SEBIDocumentLoader, RawChunk
+from src.sebi_embedding_cache import CachedEmbeddings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump to force persisted vector stores to be rebuilt
+VECTOR_STORE_VERSION = 1
+
+# Written to a store's key file while it is being built; never matches a real key
+STORE_BUILDING_MARKER = "building"
+
+# FAISS IVF-PQ: 64 subquantizers x 8 bits = 64 bytes per vector; search probes
+# 16 lists and re-ranks 5x the requested k against the exact vectors
+IVFPQ_SUBQUANTIZERS = 64
+IVFPQ_MAX_LISTS = 1024
+IVFPQ_NPROBE = 16
+IVFPQ_RERANK_FACTOR = 5
+
+# Static instructions go first, in the system message, so every request shares
+# an identical prompt prefix that Groq can serve from its prompt cache
+SYSTEM_PROMPT = """You are an expert assistant for SEBI (Securities and Exchange Board of India) regulations and policies.
+Use the provided context from SEBI documents to answer questions accurately and comprehensively.
+
+Instructions:
+1. Answer based primarily on the provided SEBI document context
+2. If the context doesn't contain enough information, clearly state this
+3. Cite specific document types when possible (Annual Report, Master Circular, FAQ)
+4. Provide year information when available
+5. Be precise and regulatory-focused in your responses
+6. If asked about recent changes, focus on the most recent documents in the context"""
+
+USER_PROMPT = """Context from SEBI documents:
+{context}
+
+Question: {question}"""
+
+# With a cross-encoder, MMR hands it this many times the final k to re-score
+RERANK_CANDIDATE_FACTOR = 3
+
+def detect_device() -> str:
+    """Pick the torch device for the embedding model (CUDA, then Apple MPS, then CPU)"""
+    try:
+        import torch
+    except ImportError:
+        return 'cpu'
+    
+    if torch.cuda.is_available():
+        return 'cuda'
+    mps = getattr(torch.backends, 'mps', None)
+    if mps is not None and mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+def read_store_key(key_file: str) -> Optional[str]:
+    """Read the corpus/model key a persisted vector store was built with"""
+    if not os.path.exists(key_file):
+        return None
+    with open(key_file, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+@contextmanager
+def store_build_lock(directory: str):
+    """
+    Hold an exclusive file lock while a persisted vector store is checked or built
+    
+    Gunicorn workers initialize concurrently; without the lock each would find
+    an empty store and add the whole corpus to it.
+    """
+    if fcntl is None:
+        yield
+        return
+    
+    lock_path = f"{os.path.normpath(directory)}.lock"
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class UsageLoggingHandler(BaseCallbackHandler):
+    """Callback that logs Groq token usage, including prompt-cache hits"""
+    
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if not usage:
+                    continue
+                cached = (usage.get('input_token_details') or {}).get('cache_read', 0)
+                logger.info(f"LLM usage: {usage.get('input_tokens', 0)} input tokens "
+                            f"({cached} cached), {usage.get('output_tokens', 0)} output tokens")
+
+class QuestionCachedEmbeddings(Embeddings):
+    """Embeddings wrapper that answers embed_query from the RAG system's question cache"""
+    
+    def __init__(self, rag_system: "SEBIRAGSystem"):
+        self.rag_system = rag_system
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.rag_system.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.rag_system.embed_question(text)
+
 class SEBIRAGSystem:
     """Complete RAG system for SEBI documents using open-source models"""
     
-    def __init__(self, groq_api_key: str, data_file: str = "data/outputs/sebi_texts_chunked_v2.jsonl"):
+    def __init__(self, groq_api_key: str, data_file: str = "data/outputs/sebi_texts_chunked_v2.jsonl",
+                 http_client=None):
         """
         Initialize the SEBI RAG system
         
         Args:
             groq_api_key: Groq API key for LLM access
             data_file: Path to the chunked SEBI data
+            http_client: Optional shared httpx.Client for Groq API calls
         """
         self.groq_api_key = groq_api_key
         self.data_file = data_file
-        self.documents = []
+        self.http_client = http_client
+        
+        # LRU of normalized question -> embedding, shared by retrieval and caching
+        self.question_cache_size = 8192
+        self._question_cache = OrderedDict()
+        self._question_cache_lock = threading.Lock()
+        self.min_word_count = 50
+        self.doc_types = None
+        self.document_stats = {}
+        self.corpus_hash = None
+        self.embedding_model_name = None
         self.vectorstore = None
+        self.retriever = None
+        self.prompt = None
         self.qa_chain = None
         
         # Set up Groq API key
         os.environ["GROQ_API_KEY"] = groq_api_key
         
-    def setup_embeddings(self, model_name: str = "BAAI/bge-large-en-v1.5"):
+    def setup_embeddings(self, model_name: str = "BAAI/bge-large-en-v1.5", device: Optional[str] = None,
+                         batch_size: int = 128, backend: Optional[str] = None,
+                         cache_embeddings: bool = True):
         """
         Set up local embedding model
         
+        Document and query embeddings are L2-normalized here, once, so the
+        vector store can rank by plain inner product (equal to cosine
+        similarity); downstream code should not normalize them again.
+        
         Args:
             model_name: HuggingFace model name for embeddings
+            device: Torch device for the model (None to auto-detect CUDA/MPS)
+            batch_size: Texts per forward pass when embedding documents
+            backend: "huggingface" (PyTorch) or "onnx" (int8 ONNX Runtime on CPU);
+                defaults to the SEBI_EMBEDDING_BACKEND environment variable
+            cache_embeddings: Persist document vectors on disk so rebuilds only
+                embed new or changed chunks
         """
-        logger.info(f"Initializing embedding model: {model_name}")
+        backend = backend or os.getenv('SEBI_EMBEDDING_BACKEND', 'huggingface')
         
-        # Use HuggingFace embeddings (free, local)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs={'device': 'cpu'},  # Use CPU for compatibility
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        if backend == 'onnx':
+            from src.sebi_onnx_embeddings import SEBIONNXEmbeddings
+            
+            # Quantized vectors differ slightly from the PyTorch ones, so the
+            # backend is part of the vector store key
+            self.embedding_model_name = f"onnx:{model_name}"
+            logger.info(f"Initializing int8 ONNX embedding model: {model_name}")
+            self.embeddings = SEBIONNXEmbeddings(model_name=model_name, batch_size=batch_size)
+        else:
+            device = device or detect_device()
+            self.embedding_model_name = model_name
+            logger.info(f"Initializing embedding model: {model_name} on {device}")
+            
+            # Use HuggingFace embeddings (free, local)
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name=model_name,
+                model_kwargs={'device': device},
+                encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+            )
+        
+        if cache_embeddings:
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_model_name)
         
         return self.embeddings
     
-    def load_documents(self, min_word_count: int = 50, doc_types: Optional[List[str]] = None):
+    def embed_question(self, question: str) -> List[float]:
+        """
+        Embed a question, reusing the vector for repeated questions
+        
+        Questions are keyed case- and whitespace-insensitively (the BGE
+        tokenizer lowercases anyway), so retries, streamed queries and the
+        app's semantic cache share one embedder forward pass per question.
+        
+        Args:
+            question: The question to embed
+            
+        Returns:
+            The normalized question embedding
+        """
+        return self.embed_question_array(question).tolist()
+    
+    def embed_question_array(self, question: str) -> np.ndarray:
         """
-        Load SEBI documents using custom loader
+        Embed a question as a float32 array, reusing the vector for repeated questions
+        
+        The LRU holds float32 arrays (4 bytes per dimension instead of a boxed
+        Python float each); callers that work in numpy skip the list round trip.
+        
+        Args:
+            question: The question to embed
+            
+        Returns:
+            The normalized question embedding (read-only; copy before modifying)
+        """
+        key = " ".join(question.split()).lower()
+        
+        with self._question_cache_lock:
+            vector = self._question_cache.get(key)
+            if vector is not None:
+                self._question_cache.move_to_end(key)
+                return vector
+        
+        vector = np.asarray(self.embeddings.embed_query(key), dtype=np.float32)
+        vector.setflags(write=False)
+        
+        with self._question_cache_lock:
+            self._question_cache[key] = vector
+            if len(self._question_cache) > self.question_cache_size:
+                self._question_cache.popitem(last=False)
+        
+        return vector
+    
+    def load_documents(self, min_word_count: int = 50, doc_types: Optional[List[str]] = None) -> Dict:
+        """
+        Scan SEBI documents using custom loader
+        
+        Chunks are not kept in memory: this pass only fingerprints and counts
+        them, and create_vector_store() streams the file again in batches when
+        it has to embed.
         
         Args:
             min_word_count: Minimum words per chunk to include
             doc_types: List of document types to include (None for all)
+        
+        Returns:
+            Counters for the selected chunks
         """
         logger.info("Loading SEBI documents...")
         
-        # Load all documents
-        loader = SEBIDocumentLoader(self.data_file, min_word_count=min_word_count)
-        all_documents = loader.load()
+        self.min_word_count = min_word_count
+        self.doc_types = doc_types
         
-        # Filter by document types if specified
-        if doc_types:
-            self.documents = [
-                doc for doc in all_documents 
-                if doc.metadata.get('doc_type') in doc_types
-            ]
-            logger.info(f"Filtered to {len(self.documents)} documents of types: {doc_types}")
-        else:
-            self.documents = all_documents
+        doc_type_counts = Counter()
+        year_counts = Counter()
+        total_words = 0
+        total_documents = 0
+        
+        # Fingerprint the corpus (in file order) so persisted embeddings can be reused safely
+        digest = hashlib.blake2b()
+        for chunk in self._iter_chunks():
+            total_documents += 1
+            doc_type = chunk.doc_type or 'unknown'
+            doc_type_counts[doc_type] += 1
+            if chunk.year is not None:
+                year_counts[str(chunk.year)] += 1
+            total_words += chunk.word_count
+            
+            digest.update(chunk.text.encode('utf-8'))
+            digest.update(b'\0')
+        self.corpus_hash = digest.hexdigest()
         
-        logger.info(f"Loaded {len(self.documents)} document chunks")
-        return self.documents
+        # Derived figures are computed here once so get_stats() does no work per call
+        self.document_stats = {
+            'total_documents': total_documents,
+            'total_words': total_words,
+            'avg_words_per_doc': total_words / total_documents if total_documents else 0,
+            'doc_types': dict(doc_type_counts),
+            'years': dict(year_counts),
+            'years_available': sorted(year_counts)
+        }
+        
+        if doc_types:
+            logger.info(f"Filtered to {total_documents} documents of types: {doc_types}")
+        logger.info(f"Loaded {total_documents} document chunks")
+        return self.document_stats
+    
+    def _iter_chunks(self) -> Iterator[RawChunk]:
+        """Stream the selected chunks from the data file"""
+        loader = SEBIDocumentLoader(self.data_file, min_word_count=self.min_word_count)
+        for chunk in loader.iter_chunks():
+            if not self.doc_types or chunk.doc_type in self.doc_types:
+                yield chunk
+    
+    def _iter_batches(self, batch_size: int) -> Iterator[List[RawChunk]]:
+        """Stream the selected chunks in lists of up to batch_size"""
+        chunks = self._iter_chunks()
+        while True:
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                return
+            yield batch
     
     def create_vector_store(self, persist_directory: str = "data/sebi_chroma_db",
-                          collection_name: str = "sebi_documents"):
+                          collection_name: str = "sebi_documents",
+                          hnsw_m: int = 32,
+                          hnsw_construction_ef: int = 200,
+                          hnsw_search_ef: int = 64,
+                          add_batch_size: int = 4096,
+                          backend: Optional[str] = None,
+                          faiss_directory: str = "data/sebi_faiss_index",
+                          faiss_index_type: Optional[str] = None):
         """
         Create Chroma vector store from documents
         
+        Chroma indexes vectors with HNSW using the inner-product metric, which
+        on the normalized embeddings from setup_embeddings() is cosine
+        similarity without L2's extra subtract-and-square per dimension. The
+        metric and graph parameters only take effect when the collection is
+        first created; older L2 collections rank normalized vectors
+        identically. The persisted collection is reused across restarts as
+        long as the corpus hash, embedding model and VECTOR_STORE_VERSION
+        match; otherwise it is rebuilt.
+        
+        With the "faiss" backend the same HNSW graph is held in memory by FAISS
+        instead, skipping Chroma's SQLite-backed persistence layer per query.
+        
         Args:
             persist_directory: Directory to persist the vector database
             collection_name: Name of the collection in Chroma
+            hnsw_m: Neighbours per node in the HNSW graph
+            hnsw_construction_ef: Candidate list size while building the graph
+            hnsw_search_ef: Candidate list size at query time
+            add_batch_size: Documents embedded and inserted per add call
+            backend: "chroma" or "faiss"; defaults to the SEBI_VECTOR_BACKEND
+                environment variable
+            faiss_directory: Directory to persist the FAISS index
+            faiss_index_type: "hnsw" or "ivfpq" (product-quantized); defaults to
+                the SEBI_FAISS_INDEX environment variable
         """
         logger.info("Creating vector store...")
         
         if not hasattr(self, 'embeddings'):
             self.setup_embeddings()
         
-        if not self.documents:
+        if not self.document_stats.get('total_documents'):
             raise ValueError("No documents loaded. Call load_documents() first.")
         
-        # Create or load Chroma vector store
-        self.vectorstore = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory
-        )
+        store_key = f"v{VECTOR_STORE_VERSION}:{self.embedding_model_name}:{self.corpus_hash}"
         
-        # Check if database already exists and has data
-        existing_count = self.vectorstore._collection.count()
+        backend = backend or os.getenv('SEBI_VECTOR_BACKEND', 'chroma')
+        lock_directory = faiss_directory if backend == 'faiss' else persist_directory
         
-        if existing_count == 0:
-            logger.info(f"Creating new vector store with {len(self.documents)} documents...")
+        with store_build_lock(lock_directory):
+            if backend == 'faiss':
+                self.vectorstore = self._create_faiss_store(
+                    faiss_directory, store_key, hnsw_m, hnsw_construction_ef, hnsw_search_ef, add_batch_size,
+                    index_type=faiss_index_type or os.getenv('SEBI_FAISS_INDEX', 'hnsw')
+                )
+                return self.vectorstore
+            
+            def open_store():
+                return Chroma(
+                    collection_name=collection_name,
+                    # Query embeddings go through embed_question()'s cache
+                    embedding_function=QuestionCachedEmbeddings(self),
+                    persist_directory=persist_directory,
+                    collection_metadata={
+                        "hnsw:space": "ip",
+                        "hnsw:M": hnsw_m,
+                        "hnsw:construction_ef": hnsw_construction_ef,
+                        "hnsw:search_ef": hnsw_search_ef
+                    }
+                )
+            
+            # Create or load Chroma vector store
+            self.vectorstore = open_store()
+            
+            # Check if database already exists and has data
+            existing_count = self.vectorstore._collection.count()
+            
+            key_file = os.path.join(persist_directory, f"{collection_name}.corpus")
+            stored_key = read_store_key(key_file)
+            
+            # Stores persisted before corpus hashing have no key file and are adopted
+            # if their size matches. An interrupted build left the building marker
+            # as its key, and a count mismatch means chunks are missing or were
+            # added more than once.
+            total_documents = self.document_stats['total_documents']
+            if existing_count > 0 and (
+                    (stored_key is not None and stored_key != store_key)
+                    or existing_count != total_documents):
+                logger.info("Documents, embedding model or document count changed; rebuilding vector store")
+                self.vectorstore.delete_collection()
+                self.vectorstore = open_store()
+                existing_count = 0
             
-            # Add documents in batches to avoid memory issues
-            batch_size = 100
-            for i in range(0, len(self.documents), batch_size):
-                batch = self.documents[i:i + batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}/{(len(self.documents)-1)//batch_size + 1}")
+            if existing_count == 0:
+                logger.info(f"Creating new vector store with {total_documents} documents...")
                 
-                self.vectorstore.add_documents(batch)
+                # Until the key is written below, the store reads as unfinished
+                with open(key_file, 'w', encoding='utf-8') as f:
+                    f.write(STORE_BUILDING_MARKER)
+                
+                # Large batches keep the embedder's forward passes full; this stays
+                # under Chroma's per-call insert limit. Only the current batch is
+                # held in memory, and it goes straight to the collection with its
+                # precomputed embeddings rather than through LangChain's wrapper.
+                batch_size = add_batch_size
+                collection = self.vectorstore._collection
+                for batch_num, batch in enumerate(self._iter_batches(batch_size), 1):
+                    logger.info(f"Processing batch {batch_num}/{(total_documents-1)//batch_size + 1}")
+                    
+                    texts = [chunk.text for chunk in batch]
+                    collection.add(
+                        ids=[str(uuid.uuid4()) for _ in batch],
+                        embeddings=self.embeddings.embed_documents(texts),
+                        metadatas=[chunk.metadata for chunk in batch],
+                        documents=texts
+                    )
+                
+                logger.info(f"Vector store created with {total_documents} documents")
+            else:
+                logger.info(f"Using existing vector store with {existing_count} documents")
+            
+            with open(key_file, 'w', encoding='utf-8') as f:
+                f.write(store_key)
             
-            logger.info(f"Vector store created with {len(self.documents)} documents")
+            return self.vectorstore
+    
+    def _create_faiss_store(self, persist_directory: str, store_key: str, hnsw_m: int,
+                            hnsw_construction_ef: int, hnsw_search_ef: int, add_batch_size: int,
+                            index_type: str = "hnsw"):
+        """
+        Load or build an in-memory FAISS (inner product) index over the documents
+        
+        "hnsw" stores full float32 vectors in an HNSW graph. "ivfpq" compresses
+        them to 64-byte product-quantized codes searched through an inverted
+        file; candidates are over-fetched and re-ranked against the exact
+        vectors (IndexRefineFlat), so the final top-k keeps full precision.
+        
+        Args:
+            persist_directory: Directory holding the saved index
+            store_key: Corpus/model key; a saved index with a different key is rebuilt
+            hnsw_m: Neighbours per node in the HNSW graph
+            hnsw_construction_ef: Candidate list size while building the graph
+            hnsw_search_ef: Candidate list size at query time
+            add_batch_size: Documents embedded per batch
+            index_type: "hnsw" or "ivfpq"
+        """
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores.utils import DistanceStrategy
+        
+        # Gunicorn workers set OMP_NUM_THREADS=1 (see run.py); apply it to FAISS's
+        # own OpenMP pool explicitly so searches never fan out across every core
+        # in each worker. Without the variable FAISS keeps its all-core default.
+        omp_threads = os.getenv('OMP_NUM_THREADS')
+        if omp_threads:
+            faiss.omp_set_num_threads(int(omp_threads))
+        
+        store_key = f"{store_key}:faiss-{index_type}"
+        key_file = os.path.join(persist_directory, "index.corpus")
+        
+        def tune(index):
+            # Search-time parameters are not persisted, so set them on every load
+            params = faiss.ParameterSpace()
+            if index_type == "ivfpq":
+                params.set_index_parameter(index, "nprobe", IVFPQ_NPROBE)
+                params.set_index_parameter(index, "k_factor_rf", IVFPQ_RERANK_FACTOR)
+            else:
+                params.set_index_parameter(index, "efSearch", hnsw_search_ef)
+        
+        if read_store_key(key_file) == store_key:
+            logger.info(f"Using existing FAISS index in {persist_directory}")
+            store = FAISS.load_local(
+                persist_directory,
+                QuestionCachedEmbeddings(self),
+                allow_dangerous_deserialization=True,  # Our own pickled docstore
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+            tune(store.index)
+            return store
+        
+        total_documents = self.document_stats['total_documents']
+        logger.info(f"Creating new FAISS {index_type} index with {total_documents} documents...")
+        
+        # FAISS keeps every Document in its in-memory docstore anyway
+        batches = []
+        documents = []
+        for batch_num, batch in enumerate(self._iter_batches(add_batch_size), 1):
+            logger.info(f"Processing batch {batch_num}/{(total_documents-1)//add_batch_size + 1}")
+            batches.append(np.asarray(
+                self.embeddings.embed_documents([chunk.text for chunk in batch]),
+                dtype=np.float32
+            ))
+            documents.extend(chunk.to_document() for chunk in batch)
+        vectors = np.concatenate(batches)
+        dimension = vectors.shape[1]
+        
+        if index_type == "ivfpq":
+            # ~4*sqrt(N) lists keeps k-means training well populated on this corpus size
+            nlist = max(1, min(IVFPQ_MAX_LISTS, int(4 * np.sqrt(len(vectors)))))
+            quantizer = faiss.IndexFlatIP(dimension)
+            ivfpq = faiss.IndexIVFPQ(quantizer, dimension, nlist, IVFPQ_SUBQUANTIZERS, 8,
+                                     faiss.METRIC_INNER_PRODUCT)
+            ivfpq.train(vectors)
+            index = faiss.IndexRefineFlat(ivfpq)
         else:
-            logger.info(f"Using existing vector store with {existing_count} documents")
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = hnsw_construction_ef
+        index.add(vectors)
+        tune(index)
+        
+        ids = [str(i) for i in range(len(documents))]
+        store = FAISS(
+            embedding_function=QuestionCachedEmbeddings(self),
+            index=index,
+            docstore=InMemoryDocstore(dict(zip(ids, documents))),
+            index_to_docstore_id=dict(enumerate(ids)),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        
+        store.save_local(persist_directory)
+        with open(key_file, 'w', encoding='utf-8') as f:
+            f.write(store_key)
         
-        return self.vectorstore
+        logger.info(f"FAISS index created with {index.ntotal} vectors")
+        return store
     
-    def setup_llm(self, model_name: str = "llama-3.3-70b-versatile", temperature: float = 0.1):
+    def setup_llm(self, model_name: str = "llama-3.3-70b-versatile", temperature: float = 0.1,
+                  streaming: bool = True):
         """
         Set up Groq LLM
         
         Args:
             model_name: Groq model name
             temperature: Temperature for response generation
+            streaming: Echo tokens to stdout as they arrive (interactive use);
+                servers and batch runs should pass False. query_stream()
+                streams either way.
         """
         logger.info(f"Initializing Groq LLM: {model_name}")
         
+        llm_kwargs = {}
+        if self.http_client is not None:
+            llm_kwargs['http_client'] = self.http_client
+        
+        callbacks = [UsageLoggingHandler()]
+        if streaming:
+            callbacks.insert(0, StreamingStdOutCallbackHandler())
+        
         self.llm = ChatGroq(
             model=model_name,
             temperature=temperature,
             max_tokens=2048,
             api_key=self.groq_api_key,
-            streaming=True,
-            callbacks=[StreamingStdOutCallbackHandler()]
+            streaming=streaming,
+            callbacks=callbacks,
+            **llm_kwargs
         )
         
         return self.llm
     
-    def create_qa_chain(self):
-        """Create the RAG QA chain"""
+    def create_qa_chain(self, k: int = 8, fetch_k: int = 60, lambda_mult: float = 0.5,
+                        reranker_model: Optional[str] = None, device: Optional[str] = None,
+                        compression_model: Optional[str] = None, compression_target_tokens: int = 1500):
+        """
+        Create the RAG QA chain
+        
+        Retrieval fetches fetch_k nearest chunks and picks a diverse subset with
+        maximal marginal relevance, so near-duplicate chunks do not crowd the
+        prompt. With a cross-encoder, MMR keeps RERANK_CANDIDATE_FACTOR * k
+        candidates and the cross-encoder re-scores them down to k.
+        
+        Optionally, LongLLMLingua then drops low-information tokens from the
+        selected chunks so fewer prompt tokens reach Groq. Compression runs a
+        causal LM locally, so it only pays off when that is cheaper than the
+        prefill it saves; it is off unless a model is configured.
+        
+        Args:
+            k: Chunks passed to the LLM
+            fetch_k: Nearest-neighbour candidates considered by MMR
+            lambda_mult: MMR trade-off between relevance (1) and diversity (0)
+            reranker_model: HuggingFace cross-encoder name, or "none" to disable;
+                defaults to the SEBI_RERANKER_MODEL environment variable
+            device: Torch device for the cross-encoder (None to auto-detect)
+            compression_model: HuggingFace causal LM for LongLLMLingua compression;
+                defaults to the SEBI_PROMPT_COMPRESSION_MODEL environment variable
+                (unset disables compression)
+            compression_target_tokens: Token budget for the compressed context
+        """
         
         if not self.vectorstore:
             raise ValueError("Vector store not created. Call create_vector_store() first.")
@@ -160,50 +632,128 @@ class SEBIRAGSystem:
         if not hasattr(self, 'llm'):
             self.setup_llm()
         
-        # Create custom prompt template
-        prompt_template = """You are an expert assistant for SEBI (Securities and Exchange Board of India) regulations and policies. 
-        Use the provided context from SEBI documents to answer questions accurately and comprehensively.
-
-        Context from SEBI documents:
-        {context}
-
-        Question: {question}
-
-        Instructions:
-        1. Answer based primarily on the provided SEBI document context
-        2. If the context doesn't contain enough information, clearly state this
-        3. Cite specific document types when possible (Annual Report, Master Circular, FAQ)
-        4. Provide year information when available
-        5. Be precise and regulatory-focused in your responses
-        6. If asked about recent changes, focus on the most recent documents in the context
-
-        Answer:"""
-        
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
+        # System instructions stay fixed; only the user message varies per query
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("user", USER_PROMPT)
+        ])
+        
+        reranker_model = reranker_model or os.getenv('SEBI_RERANKER_MODEL', 'BAAI/bge-reranker-base')
+        reranker = None
+        if reranker_model.lower() != 'none':
+            reranker = self._create_reranker(reranker_model, k, device or detect_device())
+        
+        compressors = [reranker] if reranker else []
+        compression_model = compression_model or os.getenv('SEBI_PROMPT_COMPRESSION_MODEL')
+        if compression_model:
+            compressor = self._create_prompt_compressor(
+                compression_model, compression_target_tokens, device or detect_device()
+            )
+            if compressor:
+                compressors.append(compressor)
+        
+        # Diverse (MMR) retrieval instead of the 20 most similar chunks
+        mmr_k = min(fetch_k, k * RERANK_CANDIDATE_FACTOR) if reranker else k
+        self._search_kwargs = {
+            "k": mmr_k,
+            "fetch_k": fetch_k,
+            "lambda_mult": lambda_mult
+        }
         
-        # Create retriever with better parameters
-        retriever = self.vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={
-                "k": 20,  # Retrieve top 20 most similar chunks
-            }
-        )
+        self._compressor = None
+        if len(compressors) == 1:
+            self._compressor = compressors[0]
+        elif compressors:
+            from langchain.retrievers.document_compressors import DocumentCompressorPipeline
+            self._compressor = DocumentCompressorPipeline(transformers=compressors)
         
         # Create QA chain
-        self.qa_chain = RetrievalQA.from_chain_type(
+        self.retriever = self._build_retriever()
+        self.qa_chain = self._build_chain(self.retriever)
+        self._filtered_chains = {}
+        
+        logger.info("QA chain created successfully")
+        return self.qa_chain
+    
+    def _build_retriever(self, filter_doc_type: Optional[str] = None):
+        """
+        Create the MMR retriever, wrapped in the reranking/compression stages
+        
+        Args:
+            filter_doc_type: Restrict the vector search itself to one document type
+        """
+        search_kwargs = dict(self._search_kwargs)
+        if filter_doc_type:
+            search_kwargs["filter"] = {"doc_type": filter_doc_type}
+        
+        retriever = self.vectorstore.as_retriever(search_type="mmr", search_kwargs=search_kwargs)
+        
+        if self._compressor:
+            from langchain.retrievers import ContextualCompressionRetriever
+            
+            retriever = ContextualCompressionRetriever(
+                base_compressor=self._compressor,
+                base_retriever=retriever
+            )
+        return retriever
+    
+    def _build_chain(self, retriever):
+        """Create a "stuff" RetrievalQA chain over the retriever"""
+        return RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
             retriever=retriever,
-            chain_type_kwargs={"prompt": PROMPT},
+            chain_type_kwargs={"prompt": self.prompt},
             return_source_documents=True,
-            verbose=True
+            # Verbose chain logging re-prints the whole stuffed context
+            verbose=logger.isEnabledFor(logging.DEBUG)
         )
+    
+    def _chain_for(self, filter_doc_type: Optional[str] = None):
+        """Get the QA chain, restricted to one document type if requested"""
+        if not filter_doc_type:
+            return self.qa_chain
+        
+        chain = self._filtered_chains.get(filter_doc_type)
+        if chain is None:
+            chain = self._build_chain(self._build_retriever(filter_doc_type))
+            self._filtered_chains[filter_doc_type] = chain
+        return chain
+    
+    def _create_prompt_compressor(self, model_name: str, target_tokens: int, device: str):
+        """Load a LongLLMLingua context compressor, or return None if it is unavailable"""
+        try:
+            from langchain_community.document_compressors import LLMLinguaCompressor
+        except ImportError as e:
+            logger.warning(f"Prompt compression unavailable ({e}); sending full chunks")
+            return None
         
-        logger.info("QA chain created successfully")
-        return self.qa_chain
+        logger.info(f"Initializing LongLLMLingua prompt compression: {model_name} on {device}")
+        try:
+            return LLMLinguaCompressor(
+                model_name=model_name,
+                device_map=device,
+                target_token=target_tokens,
+                rank_method="longllmlingua"
+            )
+        except ImportError as e:
+            logger.warning(f"Prompt compression unavailable ({e}); sending full chunks")
+            return None
+    
+    def _create_reranker(self, model_name: str, top_n: int, device: str):
+        """Load a cross-encoder reranker, or return None if it is unavailable"""
+        try:
+            from langchain.retrievers.document_compressors import CrossEncoderReranker
+            from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+        except ImportError as e:
+            logger.warning(f"Cross-encoder reranking unavailable ({e}); using MMR retrieval only")
+            return None
+        
+        logger.info(f"Initializing cross-encoder reranker: {model_name} on {device}")
+        return CrossEncoderReranker(
+            model=HuggingFaceCrossEncoder(model_name=model_name, model_kwargs={'device': device}),
+            top_n=top_n
+        )
     
     def query(self, question: str, filter_doc_type: Optional[str] = None) -> Dict:
         """
@@ -211,7 +761,8 @@ class SEBIRAGSystem:
         
         Args:
             question: The question to ask
-            filter_doc_type: Optional filter by document type
+            filter_doc_type: Optional filter by document type, applied inside
+                the vector search so k is filled from that type alone
             
         Returns:
             Dictionary with answer and source information
@@ -223,78 +774,126 @@ class SEBIRAGSystem:
         
         try:
             # Execute the query
-            result = self.qa_chain({"query": question})
-            
-            # Process source documents
-            sources = []
-            for doc in result.get('source_documents', []):
-                sources.append({
-                    'source_file': doc.metadata.get('source', 'Unknown'),
-                    'doc_type': doc.metadata.get('doc_type', 'Unknown'),
-                    'year': doc.metadata.get('year', 'Unknown'),
-                    'chunk_id': doc.metadata.get('chunk_id', 'Unknown'),
-                    'word_count': doc.metadata.get('word_count', 0),
-                    'quality_score': doc.metadata.get('original_quality_score', 0),
-                    'content_preview': doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-                })
-            
-            return {
-                'question': question,
-                'answer': result.get('result', 'No answer generated'),
-                'sources': sources,
-                'source_count': len(sources),
-                'timestamp': datetime.now().isoformat()
-            }
+            result = self._chain_for(filter_doc_type)({"query": question})
+            return self._format_result(question, result)
             
         except Exception as e:
             logger.error(f"Error processing query: {e}")
-            return {
-                'question': question,
-                'answer': f"Error processing query: {str(e)}",
-                'sources': [],
-                'source_count': 0,
-                'timestamp': datetime.now().isoformat()
-            }
+            return self._error_result(question, e)
     
-    def get_stats(self) -> Dict:
-        """Get statistics about the loaded documents"""
+    def query_stream(self, question: str) -> Iterator[Dict]:
+        """
+        Query the RAG system, streaming the answer as the LLM generates it
         
-        if not self.documents:
-            return {"error": "No documents loaded"}
+        Retrieval runs first and its sources are emitted before any answer text.
         
-        doc_types = {}
-        years = {}
-        total_words = 0
+        Args:
+            question: The question to ask
+            
+        Yields:
+            Event dictionaries: one {'type': 'sources'} event, {'type': 'token'}
+            events carrying answer text, then {'type': 'done'} or {'type': 'error'}
+        """
+        if not self.qa_chain:
+            self.create_qa_chain()
+        
+        logger.info(f"Streaming query: {question}")
         
-        for doc in self.documents:
-            # Count by type
-            doc_type = doc.metadata.get('doc_type', 'unknown')
-            doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
+        try:
+            docs = self.retriever.invoke(question)
+            sources = self._format_sources(docs)
+            yield {'type': 'sources', 'sources': sources, 'source_count': len(sources)}
+            
+            # Same context layout as the "stuff" chain used by query()
+            context = "\n\n".join(doc.page_content for doc in docs)
+            for chunk in self.llm.stream(self.prompt.format_messages(context=context, question=question)):
+                if chunk.content:
+                    yield {'type': 'token', 'content': chunk.content}
             
-            # Count by year
-            year = doc.metadata.get('year', 'unknown')
-            if year != 'unknown' and year is not None:
-                years[str(year)] = years.get(str(year), 0) + 1
+            yield {'type': 'done', 'timestamp': datetime.now().isoformat()}
             
-            # Sum word counts
-            total_words += doc.metadata.get('word_count', 0)
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield {'type': 'error', 'error': str(e)}
+    
+    @staticmethod
+    def _source_entry(doc: Document) -> Dict:
+        """Convert one retrieved document into a source dictionary"""
+        metadata = doc.metadata
+        content = doc.page_content
+        return {
+            'source_file': metadata.get('source', 'Unknown'),
+            'doc_type': metadata.get('doc_type', 'Unknown'),
+            'year': metadata.get('year', 'Unknown'),
+            'chunk_id': metadata.get('chunk_id', 'Unknown'),
+            'word_count': metadata.get('word_count', 0),
+            'quality_score': metadata.get('original_quality_score', 0),
+            'content_preview': content[:200] + "..." if len(content) > 200 else content
+        }
+    
+    def _format_sources(self, docs: List[Document]) -> List[Dict]:
+        """Convert retrieved documents into source dictionaries"""
+        return [self._source_entry(doc) for doc in docs]
+    
+    def _format_result(self, question: str, result: Dict) -> Dict:
+        """Convert a raw QA chain result into the response dictionary"""
+        
+        sources = self._format_sources(result.get('source_documents', []))
         
         return {
-            'total_documents': len(self.documents),
-            'total_words': total_words,
-            'avg_words_per_doc': total_words / len(self.documents) if self.documents else 0,
-            'doc_types': doc_types,
-            'years_available': sorted(years.keys()) if years else [],
+            'question': question,
+            'answer': result.get('result', 'No answer generated'),
+            'sources': sources,
+            'source_count': len(sources),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _error_result(self, question: str, error: Exception) -> Dict:
+        """Build the response dictionary for a failed query"""
+        return {
+            'question': question,
+            'answer': f"Error processing query: {str(error)}",
+            'sources': [],
+            'source_count': 0,
+            'timestamp': datetime.now().isoformat(),
+            'error': str(error)
+        }
+    
+    def get_stats(self) -> Dict:
+        """Get statistics about the loaded documents"""
+        
+        stats = self.document_stats
+        if not stats.get('total_documents'):
+            return {"error": "No documents loaded"}
+        
+        return {
+            'total_documents': stats['total_documents'],
+            'total_words': stats['total_words'],
+            'avg_words_per_doc': stats['avg_words_per_doc'],
+            'doc_types': dict(stats['doc_types']),
+            'years_available': list(stats['years_available']),
             'vector_store_ready': self.vectorstore is not None,
             'qa_chain_ready': self.qa_chain is not None
         }
 
+def build_vector_store():
+    """Build or verify the persisted vector store once, without setting up an LLM"""
+    rag = SEBIRAGSystem(os.getenv('GROQ_API_KEY', ''))
+    rag.load_documents(min_word_count=50)
+    rag.setup_embeddings()
+    rag.create_vector_store()
+
 def main():
     """Example usage of the SEBI RAG system"""
     
     # Load environment variables from .env file
     load_dotenv()
     
+    # run.py builds the store here before starting Gunicorn workers
+    if "--build-store" in sys.argv:
+        build_vector_store()
+        return
+    
     # You'll need to set your Groq API key
     groq_api_key = os.getenv('GROQ_API_KEY')
     
@@ -6,40 +6,151 @@ Tests the complete SCORES module functionality and integration with the main RAG
 
 import os
 import sys
+import io
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import ReadTimeoutError
 import json
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+from src._file_check import verify_files
+
+MAIN = 'http://localhost:5000'
+SCORES = 'http://localhost:5001'
+
+# One keep-alive connection pool shared by every request in the suite
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+
+# Base URLs that refused or timed out a connection; later calls to them fail fast.
+# A slow response (ReadTimeout) only fails its own check: the server is up.
+DEAD: Set[str] = set()
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request to a base URL that is already known to be down"""
+
+def call(base: str, method: str, path: str, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared session, with a per-base-URL circuit breaker
+    
+    Args:
+        base: Base URL of the system under test (MAIN or SCORES)
+        method: HTTP method
+        path: Path appended to the base URL
+        **kwargs: Passed on to requests (json, timeout, ...)
+    """
+    if base in DEAD:
+        raise CircuitOpenError(f"circuit open for {base}")
+    try:
+        return SESSION.request(method, f'{base}{path}', **kwargs)
+    except requests.ConnectionError as e:
+        # Includes ConnectTimeout. A GET whose read retries ran out also arrives
+        # here, wrapping ReadTimeoutError; that server is slow, not down.
+        reason = getattr(e.args[0], 'reason', None) if e.args else None
+        if not isinstance(reason, ReadTimeoutError):
+            DEAD.add(base)
+        raise
+
+# Pages and health endpoints the startup checks GET; fetched concurrently by main()
+PROBES: List[Tuple[str, str]] = [
+    (MAIN, '/api/health'),
+    (SCORES, '/api/health'),
+    (MAIN, '/'),
+    (SCORES, '/'),
+]
+
+_prefetched: Dict[Tuple[str, str], object] = {}
+
+def prefetch(probes: List[Tuple[str, str]], timeout: float = 5):
+    """Start GETs for the given (base, path) pairs in parallel; _get() picks up the results"""
+    executor = ThreadPoolExecutor(max_workers=len(probes))
+    for base, path in probes:
+        _prefetched[(base, path)] = executor.submit(call, base, 'GET', path, timeout=timeout)
+    executor.shutdown(wait=False)
+
+def _get(base: str, path: str, timeout: float = 5) -> requests.Response:
+    """GET a path, using the prefetched response if one is in flight"""
+    future = _prefetched.pop((base, path), None)
+    if future is not None:
+        return future.result()  # Re-raises the request's exception, if any
+    return call(base, 'GET', path, timeout=timeout)
+
+# Output is queued per thread and written to stdout in one call per group of tests
+_output = threading.local()
+
+def emit(message: str):
+    """Queue a line of output for the current thread"""
+    buffer = getattr(_output, 'buffer', None)
+    if buffer is None:
+        buffer = _output.buffer = io.StringIO()
+    buffer.write(message)
+    buffer.write("\n")
+
+def _take_output() -> str:
+    """Return and clear the current thread's queued output"""
+    buffer = getattr(_output, 'buffer', None)
+    if buffer is None:
+        return ""
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
+
+def flush_output():
+    """Write the current thread's queued output to stdout with a single write"""
+    text = _take_output()
+    if text:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+def _with_output(test):
+    """Run a test in a worker thread, returning its result and the output it queued"""
+    result = test()
+    return result, _take_output()
 
 def test_main_system():
     """Test main RAG system health"""
     try:
-        response = requests.get('http://localhost:5000/api/health', timeout=5)
+        response = _get(MAIN, '/api/health', timeout=5)
         if response.status_code == 200:
-            print("✅ Main RAG system is running")
+            emit("✅ Main RAG system is running")
             return True
         else:
-            print("❌ Main RAG system health check failed")
+            emit("❌ Main RAG system health check failed")
             return False
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return False
     except Exception as e:
-        print(f"❌ Main RAG system not accessible: {e}")
+        emit(f"❌ Main RAG system not accessible: {e}")
         return False
 
 def test_scores_system():
     """Test SCORES system health"""
     try:
-        response = requests.get('http://localhost:5001/api/health', timeout=5)
+        response = _get(SCORES, '/api/health', timeout=5)
         if response.status_code == 200:
             data = response.json()
-            print("✅ SCORES system is running")
-            print(f"   Database: {data.get('database', 'unknown')}")
-            print(f"   RAG System: {'Available' if data.get('rag_system_available') else 'Not Available'}")
+            emit("✅ SCORES system is running")
+            emit(f"   Database: {data.get('database', 'unknown')}")
+            emit(f"   RAG System: {'Available' if data.get('rag_system_available') else 'Not Available'}")
             return True
         else:
-            print("❌ SCORES system health check failed")
+            emit("❌ SCORES system health check failed")
             return False
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return False
     except Exception as e:
-        print(f"❌ SCORES system not accessible: {e}")
+        emit(f"❌ SCORES system not accessible: {e}")
         return False
 
 def test_user_registration():
@@ -53,8 +164,8 @@ def test_user_registration():
             "dob": "01/01/1990"
         }
         
-        response = requests.post(
-            'http://localhost:5001/api/register',
+        response = call(
+            SCORES, 'POST', '/api/register',
             json=test_user,
             timeout=10
         )
@@ -62,25 +173,28 @@ def test_user_registration():
         if response.status_code == 200:
             data = response.json()
             if data.get('success'):
-                print("✅ User registration successful")
-                print(f"   User ID: {data.get('user_id')}")
-                print(f"   Password: {data.get('password')}")
+                emit("✅ User registration successful")
+                emit(f"   User ID: {data.get('user_id')}")
+                emit(f"   Password: {data.get('password')}")
                 return data
             else:
-                print(f"❌ Registration failed: {data.get('error')}")
+                emit(f"❌ Registration failed: {data.get('error')}")
                 return None
         else:
-            print(f"❌ Registration request failed: {response.status_code}")
+            emit(f"❌ Registration request failed: {response.status_code}")
             return None
             
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return None
     except Exception as e:
-        print(f"❌ Registration test error: {e}")
+        emit(f"❌ Registration test error: {e}")
         return None
 
 def test_complaint_lodging(user_credentials):
     """Test complaint lodging functionality"""
     if not user_credentials:
-        print("❌ Skipping complaint test - no user credentials")
+        emit("❌ Skipping complaint test - no user credentials")
         return None
         
     try:
@@ -92,8 +206,8 @@ def test_complaint_lodging(user_credentials):
             "description": "Test complaint for integration testing. This is a sample complaint to verify the complaint lodging functionality works correctly."
         }
         
-        response = requests.post(
-            'http://localhost:5001/api/lodge',
+        response = call(
+            SCORES, 'POST', '/api/lodge',
             json=complaint_data,
             timeout=10
         )
@@ -101,24 +215,27 @@ def test_complaint_lodging(user_credentials):
         if response.status_code == 200:
             data = response.json()
             if data.get('success'):
-                print("✅ Complaint lodging successful")
-                print(f"   Complaint ID: {data.get('complaint_id')}")
+                emit("✅ Complaint lodging successful")
+                emit(f"   Complaint ID: {data.get('complaint_id')}")
                 return data.get('complaint_id')
             else:
-                print(f"❌ Complaint lodging failed: {data.get('error')}")
+                emit(f"❌ Complaint lodging failed: {data.get('error')}")
                 return None
         else:
-            print(f"❌ Complaint lodging request failed: {response.status_code}")
+            emit(f"❌ Complaint lodging request failed: {response.status_code}")
             return None
             
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return None
     except Exception as e:
-        print(f"❌ Complaint lodging test error: {e}")
+        emit(f"❌ Complaint lodging test error: {e}")
         return None
 
 def test_complaint_tracking(user_credentials, complaint_id):
     """Test complaint tracking functionality"""
     if not user_credentials or not complaint_id:
-        print("❌ Skipping tracking test - missing credentials or complaint ID")
+        emit("❌ Skipping tracking test - missing credentials or complaint ID")
         return False
         
     try:
@@ -128,8 +245,8 @@ def test_complaint_tracking(user_credentials, complaint_id):
             "complaint_id": complaint_id
         }
         
-        response = requests.post(
-            'http://localhost:5001/api/track',
+        response = call(
+            SCORES, 'POST', '/api/track',
             json=tracking_data,
             timeout=10
         )
@@ -138,20 +255,23 @@ def test_complaint_tracking(user_credentials, complaint_id):
             data = response.json()
             if data.get('success'):
                 complaint = data.get('complaint', {})
-                print("✅ Complaint tracking successful")
-                print(f"   Status: {complaint.get('status')}")
-                print(f"   Days Elapsed: {complaint.get('days_elapsed')}")
-                print(f"   Reminders: {len(complaint.get('reminders', []))}")
+                emit("✅ Complaint tracking successful")
+                emit(f"   Status: {complaint.get('status')}")
+                emit(f"   Days Elapsed: {complaint.get('days_elapsed')}")
+                emit(f"   Reminders: {len(complaint.get('reminders', []))}")
                 return True
             else:
-                print(f"❌ Complaint tracking failed: {data.get('error')}")
+                emit(f"❌ Complaint tracking failed: {data.get('error')}")
                 return False
         else:
-            print(f"❌ Complaint tracking request failed: {response.status_code}")
+            emit(f"❌ Complaint tracking request failed: {response.status_code}")
             return False
             
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return False
     except Exception as e:
-        print(f"❌ Complaint tracking test error: {e}")
+        emit(f"❌ Complaint tracking test error: {e}")
         return False
 
 def test_rag_integration():
@@ -161,8 +281,8 @@ def test_rag_integration():
             "question": "What are the registration requirements for stock brokers in India?"
         }
         
-        response = requests.post(
-            'http://localhost:5001/api/query',
+        response = call(
+            SCORES, 'POST', '/api/query',
             json=test_query,
             timeout=15
         )
@@ -170,19 +290,22 @@ def test_rag_integration():
         if response.status_code == 200:
             data = response.json()
             if data.get('success'):
-                print("✅ RAG system integration successful")
-                print(f"   Answer length: {len(data.get('answer', ''))}")
-                print(f"   Sources: {data.get('source_count', 0)}")
+                emit("✅ RAG system integration successful")
+                emit(f"   Answer length: {len(data.get('answer', ''))}")
+                emit(f"   Sources: {data.get('source_count', 0)}")
                 return True
             else:
-                print(f"❌ RAG query failed: {data.get('error')}")
+                emit(f"❌ RAG query failed: {data.get('error')}")
                 return False
         else:
-            print(f"❌ RAG query request failed: {response.status_code}")
+            emit(f"❌ RAG query request failed: {response.status_code}")
             return False
             
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return False
     except Exception as e:
-        print(f"❌ RAG integration test error: {e}")
+        emit(f"❌ RAG integration test error: {e}")
         return False
 
 def test_file_structure():
@@ -197,61 +320,64 @@ def test_file_structure():
         "index.html"  # Main system
     ]
     
-    missing_files = []
-    for file_path in required_files:
-        if not Path(file_path).exists():
-            missing_files.append(file_path)
-        else:
-            print(f"✅ Found: {file_path}")
+    present_files, missing_files = verify_files(required_files)
+    for file_path in present_files:
+        emit(f"✅ Found: {file_path}")
     
     if missing_files:
-        print(f"\n❌ Missing files:")
+        emit(f"\n❌ Missing files:")
         for file in missing_files:
-            print(f"   - {file}")
+            emit(f"   - {file}")
         return False
     
-    print("✅ All required files present")
+    emit("✅ All required files present")
     return True
 
 def test_navigation_integration():
     """Test navigation integration between systems"""
     try:
         # Test main system has SCORES link
-        response = requests.get('http://localhost:5000/', timeout=5)
+        response = _get(MAIN, '/', timeout=5)
         if response.status_code == 200:
             content = response.text
             if 'SCORES Complaints' in content and 'scores/index.html' in content:
-                print("✅ Main system has SCORES navigation")
+                emit("✅ Main system has SCORES navigation")
             else:
-                print("❌ Main system missing SCORES navigation")
+                emit("❌ Main system missing SCORES navigation")
                 return False
         else:
-            print("❌ Could not fetch main system page")
+            emit("❌ Could not fetch main system page")
             return False
         
         # Test SCORES system has back link
-        response = requests.get('http://localhost:5001/', timeout=5)
+        response = _get(SCORES, '/', timeout=5)
         if response.status_code == 200:
             content = response.text
             if '../index.html' in content:
-                print("✅ SCORES system has back navigation")
+                emit("✅ SCORES system has back navigation")
             else:
-                print("❌ SCORES system missing back navigation")
+                emit("❌ SCORES system missing back navigation")
                 return False
         else:
-            print("❌ Could not fetch SCORES system page")
+            emit("❌ Could not fetch SCORES system page")
             return False
         
         return True
         
+    except CircuitOpenError as e:
+        emit(f"⏭  SKIPPED ({e})")
+        return False
     except Exception as e:
-        print(f"❌ Navigation integration test error: {e}")
+        emit(f"❌ Navigation integration test error: {e}")
         return False
 
 def main():
     """Run all integration tests"""
-    print("🧪 SEBI SCORES Integration Test Suite")
-    print("=" * 50)
+    emit("🧪 SEBI SCORES Integration Test Suite")
+    emit("=" * 50)
+    
+    # The probes below run one after another; overlap their network waits
+    prefetch(PROBES)
     
     test_results = {
         "File Structure": test_file_structure(),
@@ -259,51 +385,69 @@ def main():
         "SCORES System": test_scores_system(),
         "Navigation Integration": test_navigation_integration(),
     }
+    flush_output()
     
     # Only run API tests if both systems are running
     if test_results["Main RAG System"] and test_results["SCORES System"]:
-        print("\n🔧 Testing API Functionality...")
+        emit("\n🔧 Testing API Functionality...")
+        
+        # The RAG query does not depend on the complaint chain; overlap it with the chain
+        rag_executor = ThreadPoolExecutor(max_workers=1)
+        rag_result = rag_executor.submit(_with_output, test_rag_integration)
+        rag_executor.shutdown(wait=False)
         
         # Test user registration
         user_credentials = test_user_registration()
         test_results["User Registration"] = user_credentials is not None
+        flush_output()
         
         # Test complaint lodging
         complaint_id = test_complaint_lodging(user_credentials)
         test_results["Complaint Lodging"] = complaint_id is not None
+        flush_output()
         
         # Test complaint tracking
         test_results["Complaint Tracking"] = test_complaint_tracking(user_credentials, complaint_id)
+        flush_output()
         
-        # Test RAG integration
-        test_results["RAG Integration"] = test_rag_integration()
+        # Test RAG integration; its output was queued in the worker thread
+        test_results["RAG Integration"], rag_output = rag_result.result()
+        sys.stdout.write(rag_output)
     else:
-        print("\n⚠️ Skipping API tests - systems not running")
-        print("   Start both systems:")
-        print("   - Main system: python run.py")
-        print("   - SCORES system: python scores/app_scores.py")
+        emit("\n⚠️ Skipping API tests - systems not running")
+        emit("   Start both systems:")
+        emit("   - Main system: python run.py")
+        emit("   - SCORES system: python scores/app_scores.py")
     
     # Print summary
-    print("\n📊 Test Results Summary")
-    print("=" * 30)
+    emit("\n📊 Test Results Summary")
+    emit("=" * 30)
     
     passed = 0
     total = len(test_results)
     
     for test_name, result in test_results.items():
         status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{test_name:25} {status}")
+        emit(f"{test_name:25} {status}")
         if result:
             passed += 1
     
-    print(f"\nOverall: {passed}/{total} tests passed")
+    emit(f"\nOverall: {passed}/{total} tests passed")
+    for base in sorted(DEAD):
+        emit(f"⏭  {base} was unreachable; circuit opened, later calls to it failed fast")
     
     if passed == total:
-        print("🎉 All tests passed! The SCORES integration is working correctly.")
+        emit("🎉 All tests passed! The SCORES integration is working correctly.")
+        flush_output()
         return 0
     else:
-        print("⚠️ Some tests failed. Please check the issues above.")
+        emit("⚠️ Some tests failed. Please check the issues above.")
+        flush_output()
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main())
+    try:
+        sys.exit(main())
+    finally:
+        # Don't lose queued output if a test raises or the run is interrupted
+        flush_output()